@@ -1,3 +1,5 @@
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.views import exception_handler
 from rest_framework_tracking.mixins import LoggingMixin
 
@@ -21,3 +23,147 @@ class SafeLoggingMixin(LoggingMixin):
 
         # Fall back to DRF’s base exception handler
         return super().handle_exception(exc)
+
+
+# ====================================
+# Sparse fieldsets: ?fields= / ?expand=
+# ====================================
+def _parse_paths(value):
+    """'id,course.title,course.lessons' -> {'id': {}, 'course': {'title': {}, 'lessons': {}}}"""
+    tree = {}
+    for path in (value or "").split(","):
+        node = tree
+        for name in filter(None, (part.strip() for part in path.split("."))):
+            node = node.setdefault(name, {})
+    return tree
+
+
+class SparseFields:
+    """
+    Parsed ``?fields=`` / ``?expand=`` query params of a read request.
+
+    - ``fields`` whitelists what gets serialized; dotted paths select inside
+      nested objects (``course.title``), a bare name keeps the whole object.
+    - ``expand`` switches nested objects to "collapsed by default": any nested
+      serializer not listed (or implied by a dotted ``fields`` path) is rendered
+      as its primary key(s) instead.
+
+    Without either param the output is unchanged.
+    """
+    def __init__(self, fields, expand):
+        self.fields = _parse_paths(fields) if fields else None
+        self.expand = _parse_paths(expand) if expand is not None else None
+        if self.expand is not None and self.fields:
+            self._merge_implied_expands(self.fields, self.expand)
+
+    @classmethod
+    def from_request(cls, request):
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        if not hasattr(request, "_sparse_fields"):
+            params = request.query_params
+            sparse = cls(params.get("fields"), params.get("expand"))
+            request._sparse_fields = sparse if (sparse.fields or sparse.expand is not None) else None
+        return request._sparse_fields
+
+    def _merge_implied_expands(self, fields, expand):
+        for name, children in fields.items():
+            if children:
+                self._merge_implied_expands(children, expand.setdefault(name, {}))
+
+    def _subtree(self, tree, path):
+        for name in path:
+            tree = tree.get(name)
+            if tree is None:
+                return None
+        return tree
+
+    def allowed(self, path):
+        """Names allowed under ``path`` (a list of field names), or None for all."""
+        if self.fields is None:
+            return None
+        tree = self.fields
+        for name in path:
+            tree = tree.get(name, {})
+            if not tree:
+                return None
+        return set(tree)
+
+    def expanded(self, path):
+        """Names of nested serializers rendered in full under ``path``, or None for all."""
+        if self.expand is None:
+            return None
+        tree = self._subtree(self.expand, path)
+        return set(tree) if tree is not None else set()
+
+    def requested(self, dotted):
+        """Whether the field at ``dotted`` ('course.lessons') is serialized in any form."""
+        path = dotted.split(".")
+        for depth, name in enumerate(path):
+            allowed = self.allowed(path[:depth])
+            if allowed is not None and name not in allowed:
+                return False
+            if depth < len(path) - 1 and not self.is_expanded(".".join(path[:depth + 1])):
+                return False
+        return True
+
+    def is_expanded(self, dotted):
+        """Whether the nested object at ``dotted`` is serialized in full."""
+        path = dotted.split(".")
+        expanded = self.expanded(path[:-1])
+        return expanded is None or path[-1] in expanded
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin applying ``?fields=`` / ``?expand=`` (see SparseFields) to
+    itself and to nested serializers that also use it. Write requests are
+    never affected.
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        sparse = SparseFields.from_request(self.context.get("request"))
+        if sparse is None:
+            return fields
+
+        path = self._sparse_path()
+        allowed = sparse.allowed(path)
+        if allowed is not None:
+            fields = {name: field for name, field in fields.items() if name in allowed}
+
+        expanded = sparse.expanded(path)
+        if expanded is not None:
+            for name, field in list(fields.items()):
+                if isinstance(field, serializers.BaseSerializer) and name not in expanded:
+                    fields[name] = serializers.PrimaryKeyRelatedField(
+                        read_only=True,
+                        many=isinstance(field, serializers.ListSerializer),
+                        source=field.source,
+                    )
+        return fields
+
+    def _sparse_path(self):
+        path, node = [], self
+        while node.parent is not None:
+            if node.field_name:
+                path.insert(0, node.field_name)
+            node = node.parent
+        return path
+
+
+class SparseFieldsViewMixin:
+    """
+    View helpers so get_queryset() only joins/prefetches what ?fields= / ?expand=
+    will actually serialize.
+    """
+    @property
+    def sparse_fields(self):
+        return SparseFields.from_request(self.request)
+
+    def field_requested(self, dotted):
+        sparse = self.sparse_fields
+        return sparse is None or sparse.requested(dotted)
+
+    def field_expanded(self, dotted):
+        sparse = self.sparse_fields
+        return sparse is None or (sparse.requested(dotted) and sparse.is_expanded(dotted))
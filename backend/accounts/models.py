@@ -39,6 +39,12 @@ class User(AbstractUser):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Student list paging (see core.pagination.KeysetPagination)
+            models.Index(fields=['role', 'created_at', 'id']),
+        ]
     
     
 class StudentGroup(models.Model):
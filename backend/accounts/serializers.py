@@ -7,13 +7,14 @@ from django.db import transaction
 
 # Import models
 from .models import User, StudentGroup
+from .mixins import SparseFieldsMixin
 from courses.models import Course
 from enrollments.models import Enrollment, GroupEnrollment
 
 # ====================================
 # Base User Serializer (Reusable)
 # ====================================
-class BaseUserSerializer(serializers.ModelSerializer):
+class BaseUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     avatar = serializers.ImageField(required=False, allow_null=True)
     avatar_url = serializers.SerializerMethodField()
 
@@ -126,7 +127,7 @@ class AdminSerializer(BaseUserSerializer):
 # ====================================
 # Helper Serializers
 # ====================================
-class SimpleUserSerializer(serializers.ModelSerializer):
+class SimpleUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = [
@@ -135,7 +136,7 @@ class SimpleUserSerializer(serializers.ModelSerializer):
         ]
 
 
-class SimpleCourseSerializer(serializers.ModelSerializer):
+class SimpleCourseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Course
         fields = ["id", "title", "description"]
@@ -152,7 +153,7 @@ class StudentInputSerializer(serializers.Serializer):
 # ====================================
 # Student Group Serializer
 # ====================================
-class StudentGroupSerializer(serializers.ModelSerializer):
+class StudentGroupSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # For write
     students = StudentInputSerializer(many=True, write_only=True, required=False)
     course = serializers.PrimaryKeyRelatedField(
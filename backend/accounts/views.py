@@ -7,9 +7,10 @@ from rest_framework_tracking.mixins import LoggingMixin
 from django.db.models import Q
 
 # Import Local Mixins & Models
-from .mixins import SafeLoggingMixin
+from .mixins import SafeLoggingMixin, SparseFieldsViewMixin
 from .models import User, StudentGroup
 from .permissions import IsAdminOrInstructor
+from core.pagination import KeysetPagination
 
 # Import External Models (Safe if apps are loaded)
 from courses.models import Course
@@ -33,6 +34,8 @@ class UserViewSet(LoggingMixin, viewsets.ModelViewSet):
     queryset = User.objects.none()
     serializer_class = UserSerializer
     permission_classes = [IsAdminOrInstructor]
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         # Optimization: Fetch students for the instructor in a single query
@@ -97,20 +100,23 @@ class AdminViewSet(SafeLoggingMixin, viewsets.ModelViewSet):
 # -------------------------------
 # Student Group ViewSet
 # -------------------------------
-class StudentGroupViewSet(LoggingMixin, viewsets.ModelViewSet):
-    # Optimization: Prefetch students to avoid N+1 in serializer list view
-    queryset = StudentGroup.objects.prefetch_related('students').all()
+class StudentGroupViewSet(SparseFieldsViewMixin, LoggingMixin, viewsets.ModelViewSet):
+    queryset = StudentGroup.objects.all()
     serializer_class = StudentGroupSerializer
     permission_classes = [IsAdminOrInstructor]
 
     def get_queryset(self):
+        queryset = super().get_queryset()
         # Optimization: Use relationship filtering instead of manual lists
         if self.request.user.role == "instructor":
-            return StudentGroup.objects.filter(
+            queryset = queryset.filter(
                 course_enrollments__course__instructors=self.request.user
-            ).distinct().prefetch_related('students')
-            
-        return self.queryset
+            ).distinct()
+
+        # Optimization: Prefetch students to avoid N+1 in serializer list view
+        if self.field_requested('students_info'):
+            queryset = queryset.prefetch_related('students')
+        return queryset
 
 # -------------------------------
 # User Registration View
@@ -0,0 +1,158 @@
+"""
+Load test: concurrent AI tutor sessions (utils/ai_service.py) in one process.
+
+Runs the tutor app with the fake model backend (AI_TUTOR_MODEL_BACKEND=fake)
+in one child process and a stub of the DRF endpoints it calls (each answering
+after STUB_DRF_LATENCY seconds) in another, then opens N WebSocket sessions
+at once from this process. Reports
+session start (first chunk of the first turn, which includes fetching the
+tutor context), time to first streamed chunk and full turn latency; with a
+non-blocking loop these stay close to the fake model's own timing
+(FAKE_MODEL_REPLY_WORDS x FAKE_MODEL_TOKEN_DELAY) however many sessions run.
+Also reports how many requests and bytes the transcript sync sent the stub.
+No Gemini key, Django or network access is needed.
+
+Usage: python bench_ai_tutor.py [sessions] [turns]
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import time
+
+os.environ["AI_TUTOR_MODEL_BACKEND"] = "fake"
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from websockets.asyncio.client import connect
+
+from utils import ai_service
+
+STUB_DRF_LATENCY = float(os.getenv("STUB_DRF_LATENCY", "0.05"))
+
+stub_drf = FastAPI()
+
+
+@stub_drf.middleware("http")
+async def stub_latency(request, call_next):
+    await asyncio.sleep(STUB_DRF_LATENCY)
+    return await call_next(request)
+
+
+@stub_drf.get("/")
+async def stub_root():
+    return {}
+
+
+@stub_drf.get("/lessons/{lesson_id}/tutor_context/")
+async def stub_tutor_context(lesson_id: int):
+    return {
+        "lesson_id": lesson_id,
+        "lesson_title": "Benchmark Lesson",
+        "lesson_summary": "A lesson used for load testing.",
+        "course_id": 1,
+        "course_title": "Benchmark Course",
+        "persona": "You are a benchmark tutor.",
+    }
+
+
+stub_transcripts = {}
+stub_sync = {"requests": 0, "bytes": 0}
+
+
+@stub_drf.post("/ai-conversations/append/")
+async def stub_append_messages(request: Request):
+    body = await request.body()
+    stub_sync["requests"] += 1
+    stub_sync["bytes"] += len(body)
+    batch = json.loads(body)
+    stored = stub_transcripts.setdefault(batch["session_id"], [])
+    if batch["offset"] > len(stored):
+        return JSONResponse({"length": len(stored)}, status_code=409)
+    stored.extend(batch["messages"][len(stored) - batch["offset"]:])
+    return {"length": len(stored)}
+
+
+@stub_drf.get("/stats/")
+async def stub_stats():
+    return {**stub_sync, "messages": sum(map(len, stub_transcripts.values()))}
+
+
+def serve(app):
+    """Serves ``app`` from a forked child process; returns the process and port."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(2048)
+    port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    process = multiprocessing.get_context("fork").Process(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    process.start()
+    for _ in range(500):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/")
+            return process, port
+        except httpx.TransportError:
+            time.sleep(0.02)
+    raise RuntimeError("server did not start")
+
+
+async def session(url, turns, reply_words, session_start, first_chunk, turn_times):
+    async with connect(url, max_queue=None) as ws:
+        for turn in range(turns):
+            start = time.perf_counter()
+            await ws.send(json.dumps({"content": f"Question {turn}"}))
+            for chunk in range(reply_words):
+                json.loads(await ws.recv())
+                if chunk == 0:
+                    (session_start if turn == 0 else first_chunk).append(time.perf_counter() - start)
+            turn_times.append(time.perf_counter() - start)
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"p50 {statistics.median(ordered) * 1000:8.1f} ms   p95 {p95 * 1000:8.1f} ms"
+
+
+async def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    reply_words = int(os.getenv("FAKE_MODEL_REPLY_WORDS", "40"))
+    token_delay = float(os.getenv("FAKE_MODEL_TOKEN_DELAY", "0.02"))
+
+    drf_process, drf_port = serve(stub_drf)
+    os.environ["DRF_BACKEND_URL"] = f"http://127.0.0.1:{drf_port}"
+    tutor_process, tutor_port = serve(ai_service.app)
+
+    session_start, first_chunk, turn_times = [], [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        session(f"ws://127.0.0.1:{tutor_port}/ws/tutor/{i}?token=bench", turns, reply_words, session_start, first_chunk, turn_times)
+        for i in range(sessions)
+    ))
+    elapsed = time.perf_counter() - start
+
+    print(f"{sessions} sessions x {turns} turns in {elapsed:.2f} s "
+          f"(fake model: {reply_words} chunks x {token_delay * 1000:.0f} ms = {reply_words * token_delay * 1000:.0f} ms/turn)")
+    print(f"session start {percentiles(session_start)}   (DRF stub latency {STUB_DRF_LATENCY * 1000:.0f} ms)")
+    if first_chunk:
+        print(f"first chunk   {percentiles(first_chunk)}")
+    print(f"full turn     {percentiles(turn_times)}")
+    # Sessions flush their last batch as they close; give them a moment
+    await asyncio.sleep(float(os.getenv("TRANSCRIPT_FLUSH_DELAY", "2.0")) + 1)
+    stats = httpx.get(f"http://127.0.0.1:{drf_port}/stats/").json()
+    print(f"transcript sync: {stats['messages']} messages stored "
+          f"in {stats['requests']} requests, {stats['bytes'] / 1024:.1f} KiB sent")
+
+    for process in (tutor_process, drf_process):
+        process.terminate()
+        process.join()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,52 @@
+"""
+Microbenchmark: cost of getting a Drive service object per call.
+
+Compares what upload_video_private / check_video_processing_status used to do
+(build('drive', 'v3') on every call) with utils.drive_service.get_drive_service().
+No network access or token.json is needed: credentials are stubbed.
+
+Usage: python bench_drive_service.py [iterations]
+"""
+import sys
+import time
+import tracemalloc
+from unittest import mock
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+from utils import drive_service
+
+
+def measure(label, func, iterations):
+    func()  # warm-up (imports, first parse)
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_call_ms = elapsed / iterations * 1000
+    print(f"{label:<32} {per_call_ms:9.3f} ms/call   peak {peak / 1024:8.0f} KiB")
+    return per_call_ms
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    creds = Credentials(token='benchmark-token')
+
+    with mock.patch.object(drive_service, 'get_credentials', return_value=creds):
+        before = measure(
+            "build('drive', 'v3') per call",
+            lambda: build('drive', 'v3', credentials=creds, static_discovery=True),
+            iterations,
+        )
+        after = measure("get_drive_service()", drive_service.get_drive_service, iterations)
+
+    print(f"\n{iterations} iterations: {before / after:,.0f}x faster, "
+          f"{before - after:.3f} ms saved per Drive call")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,10 @@
 from rest_framework import serializers
+from accounts.mixins import SparseFieldsMixin
 from .models import Certificate
 from enrollments.serializers import EnrollmentSerializer
 
 
-class CertificateSerializer(serializers.ModelSerializer):
+class CertificateSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     enrollment = EnrollmentSerializer(read_only=True)
 
     class Meta:
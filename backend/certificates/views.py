@@ -1,10 +1,27 @@
 from rest_framework import viewsets, permissions
 from .models import Certificate
 from .serializers import CertificateSerializer
+from accounts.mixins import SparseFieldsViewMixin
 from accounts.permissions import IsAdminOrInstructor
+from courses.serializers import course_tree_prefetches
 from rest_framework_tracking.mixins import LoggingMixin
 
-class CertificateViewSet(LoggingMixin, viewsets.ReadOnlyModelViewSet):  # Admin/Instructor view only
+class CertificateViewSet(SparseFieldsViewMixin, LoggingMixin, viewsets.ReadOnlyModelViewSet):  # Admin/Instructor view only
     queryset = Certificate.objects.all()
     serializer_class = CertificateSerializer
     permission_classes = [IsAdminOrInstructor]
+
+    def get_queryset(self):
+        # Pre-load the nested enrollment/student/course tree, skipping what
+        # ?fields= / ?expand= leave out
+        queryset = super().get_queryset()
+        if not self.field_expanded('enrollment'):
+            return queryset
+        queryset = queryset.select_related('enrollment')
+        if self.field_expanded('enrollment.student'):
+            queryset = queryset.select_related('enrollment__student')
+        if self.field_expanded('enrollment.course'):
+            queryset = queryset.select_related('enrollment__course').prefetch_related(*course_tree_prefetches(
+                'enrollment__course__', requested=lambda name: self.field_requested(f'enrollment.course.{name}')
+            ))
+        return queryset
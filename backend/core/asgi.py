@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Run with e.g. ``uvicorn core.asgi:application --workers 4`` and set
+VIDEO_STREAM_ASYNC=true so lesson video streams use the async view
+(courses/async_views.py) instead of pinning a worker thread per viewer.
 """
 
 import os
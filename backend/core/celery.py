@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from kombu import Queue
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
@@ -9,6 +10,44 @@ app = Celery('backend')
 # the configuration object to child processes.
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
+# Separate queues so minutes-long video jobs cannot starve document
+# conversions, and neither can delay the quick bookkeeping tasks. Run one
+# worker per queue in production, e.g.
+#   celery -A core worker -Q media -c 2
+#   celery -A core worker -Q documents -c 4
+#   celery -A core worker -Q light
+# (a worker started without -Q consumes all three, which is fine in development).
+app.conf.task_queues = (
+    Queue('media'),
+    Queue('documents'),
+    Queue('light'),
+)
+app.conf.task_default_queue = 'light'
+# Priorities order tasks within a queue; with the Redis broker 0 is the highest
+app.conf.task_routes = {
+    'courses.tasks.upload_lesson_video_to_gemini': {'queue': 'media', 'priority': 5},
+    'courses.tasks.wait_for_gemini_video': {'queue': 'light', 'priority': 3},
+    'courses.tasks.summarize_lesson_video': {'queue': 'media', 'priority': 4},
+    'courses.tasks.upload_lesson_video_to_drive': {'queue': 'media', 'priority': 5},
+    'courses.tasks.convert_lesson_to_pdf': {'queue': 'documents', 'priority': 3},
+    'courses.tasks.process_lesson_ai_summary': {'queue': 'documents', 'priority': 6},
+    'courses.tasks.poll_video_processing_status': {'queue': 'light', 'priority': 2},
+    'enrollments.tasks.recompute_course_progress': {'queue': 'light', 'priority': 4},
+}
+app.conf.task_default_priority = 5
+app.conf.broker_transport_options = {
+    'queue_order_strategy': 'priority',
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    # With acks_late a task not acked within this window is redelivered; keep
+    # it above the longest video job
+    'visibility_timeout': 3 * 60 * 60,
+}
+# Reserve one task at a time: long tasks must not sit prefetched behind a busy
+# child process, and prefetching would defeat the priorities
+app.conf.worker_prefetch_multiplier = 1
+app.conf.task_acks_late = True
+
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
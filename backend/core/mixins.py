@@ -0,0 +1,87 @@
+# core/mixins.py
+import copy
+
+from django.core.files import File
+from django.db.models import FileField
+
+
+class DirtyFieldsMixin:
+    """
+    Remembers the value of every concrete field as it was loaded (or last
+    saved) so models can tell which fields changed without re-reading the row.
+
+    Mix in before ``models.Model``::
+
+        class Lesson(DirtyFieldsMixin, models.Model): ...
+
+    File fields are compared by stored name, so a freshly assigned upload is
+    always dirty. Deferred fields are not tracked until they are loaded; one
+    assigned before being loaded counts as dirty.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loaded_values = self._snapshot()
+
+    def _snapshot(self, attnames=None):
+        values = {}
+        for field in self._meta.concrete_fields:
+            if field.attname not in self.__dict__:
+                continue  # deferred
+            if attnames is not None and field.attname not in attnames:
+                continue
+            values[field.attname] = self._comparable(field, self.__dict__[field.attname])
+        return values
+
+    @staticmethod
+    def _comparable(field, value):
+        if isinstance(field, FileField):
+            if isinstance(value, File) and not getattr(value, '_committed', False):
+                return value  # fresh upload: never equal to a stored name
+            return getattr(value, 'name', value) or None
+        if isinstance(value, (dict, list)):
+            return copy.deepcopy(value)
+        return value
+
+    def get_dirty_fields(self):
+        """Maps the name of each changed field to its loaded value."""
+        current = self._snapshot()
+        dirty = {}
+        for field in self._meta.concrete_fields:
+            if field.attname not in current:
+                continue
+            if field.attname not in self._loaded_values:
+                dirty[field.name] = None
+            elif current[field.attname] != self._loaded_values[field.attname]:
+                dirty[field.name] = self._loaded_values[field.attname]
+        return dirty
+
+    def has_changed(self, *field_names):
+        """True if any of ``field_names`` changed since load (always True for new rows)."""
+        if self._state.adding:
+            return True
+        dirty = self.get_dirty_fields()
+        return any(self._meta.get_field(name).name in dirty for name in field_names)
+
+    def save_dirty(self, **kwargs):
+        """Saves only the changed fields; a no-op when nothing changed."""
+        if self._state.adding:
+            return self.save(**kwargs)
+        dirty = self.get_dirty_fields()
+        if dirty:
+            self.save(update_fields=list(dirty), **kwargs)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self._loaded_values = self._snapshot()
+        else:
+            attnames = {self._meta.get_field(name).attname for name in update_fields}
+            self._loaded_values.update(self._snapshot(attnames))
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        # Also runs when a deferred field is first accessed
+        attnames = None if fields is None else {self._meta.get_field(name).attname for name in fields}
+        self._loaded_values.update(self._snapshot(attnames))
@@ -0,0 +1,146 @@
+# core/pagination.py
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Page-number pagination by default, with opt-in keyset (cursor) pagination.
+
+    Clients switch per request by sending ``?cursor=`` (empty for the first
+    page) and then follow the returned ``next``/``previous`` links. Pages are
+    positioned with a WHERE on the view's ``cursor_ordering`` columns, e.g.
+    ``('-created_at', '-id')``, so deep pages cost the same as the first one
+    and no COUNT(*) runs. ``?estimate_count=1`` adds the planner's row
+    estimate as ``count`` (PostgreSQL only, ``null`` elsewhere).
+
+    The last ordering column must be unique (normally the primary key) and
+    the columns should be covered by an index.
+    """
+    cursor_query_param = 'cursor'
+    estimate_query_param = 'estimate_count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.model_meta = queryset.model._meta
+        self.ordering = tuple(view.cursor_ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        base_queryset = queryset
+
+        ordering = self._invert(self.ordering) if reverse else self.ordering
+        if position is not None:
+            queryset = queryset.filter(self._after(position, ordering))
+        rows = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page_rows = rows
+        self.wants_estimate = request.query_params.get(self.estimate_query_param) in ('1', 'true')
+        if self.wants_estimate:
+            self.estimated_count = self.estimate_count(base_queryset)
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.wants_estimate:
+            payload = {'count': self.estimated_count, **payload}
+        return Response(payload)
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.page_rows:
+            return None
+        return self._link(self.page_rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page_rows:
+            return None
+        return self._link(self.page_rows[0], reverse=True)
+
+    # --- cursor encoding ---
+
+    def _link(self, row, reverse):
+        values = [self._field(name).value_to_string(row) for name in self.fields]
+        token = json.dumps({'v': values, 'r': reverse}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(token.encode()).decode().rstrip('=')
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            token = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            values = token['v']
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = [self._field(name).to_python(value) for name, value in zip(self.fields, values)]
+            return position, bool(token.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    # --- keyset filtering ---
+
+    def _field(self, name):
+        return self.model_meta.get_field(name)
+
+    def _after(self, position, ordering):
+        """
+        WHERE clause for rows strictly after ``position`` in ``ordering``:
+        (a > x) OR (a = x AND b > y) OR ... with > / < per column direction.
+        """
+        condition = Q()
+        equal = {}
+        for name, value in zip(ordering, position):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    @staticmethod
+    def _invert(ordering):
+        return tuple(name[1:] if name.startswith('-') else f'-{name}' for name in ordering)
+
+    @staticmethod
+    def estimate_count(queryset):
+        """Row estimate from the PostgreSQL planner, or None on other databases."""
+        if connections[queryset.db].vendor != 'postgresql':
+            return None
+        try:
+            plan = json.loads(queryset.order_by().explain(format='json'))
+            return int(plan[0]['Plan']['Plan Rows'])
+        except Exception:
+            return None
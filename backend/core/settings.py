@@ -8,6 +8,7 @@ from pathlib import Path
 from datetime import timedelta
 from django.urls import reverse_lazy
 import os
+import shutil
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 # SECURITY WARNING: keep the secret key used in production secret!
@@ -226,6 +227,69 @@ CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Kolkata'
+CELERY_BEAT_SCHEDULE = {
+    # Flips Lesson.is_processed once Drive has finished processing the video
+    "poll-video-processing-status": {
+        "task": "courses.tasks.poll_video_processing_status",
+        "schedule": 60.0,
+    },
+}
+# (first, max) seconds between status checks of a video that is still processing
+VIDEO_STATUS_POLL_BACKOFF = (60, 60 * 60)
+
+# Seconds between checks of a video Gemini is still processing, and how long
+# to keep checking before giving up on the AI summary
+VIDEO_AI_POLL_INTERVAL = 10
+VIDEO_AI_POLL_TIMEOUT = 30 * 60
+
+# Tasks of one kind a single tenant may run at once across all workers (see
+# utils/tenant_limits.py); 0 removes the cap
+TENANT_TASK_CONCURRENCY = {
+    "media": int(os.getenv("TENANT_MEDIA_CONCURRENCY", 2)),
+    "documents": int(os.getenv("TENANT_DOCUMENT_CONCURRENCY", 4)),
+}
+# Seconds a slot stays taken if its worker dies without releasing it; must
+# exceed the longest run of that kind of task
+TENANT_SLOT_LEASE = {
+    "media": 2 * 60 * 60,
+    "documents": 30 * 60,
+}
+# Seconds before a task that found its tenant at the cap is tried again
+TENANT_BUSY_RETRY_COUNTDOWN = 30
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://127.0.0.1:6379/2",
+    }
+}
+
+# Seconds to wait after a lesson/quiz is added or removed before recomputing
+# the progress of every enrollment in that course (edits in between collapse)
+PROGRESS_RECOMPUTE_DEBOUNCE = 30
+
+# Disk cache of proxied Drive video bytes (utils/video_cache.py).
+# Set VIDEO_CACHE_MAX_BYTES to 0 to stream straight from Drive.
+VIDEO_CACHE_DIR = os.getenv("VIDEO_CACHE_DIR", os.path.join(BASE_DIR, "video_cache"))
+VIDEO_CACHE_MAX_BYTES = int(os.getenv("VIDEO_CACHE_MAX_BYTES", 5 * 1024 ** 3))
+VIDEO_CACHE_CHUNK_SIZE = int(os.getenv("VIDEO_CACHE_CHUNK_SIZE", 1024 ** 2))
+# How often each worker adds its hit/miss counters to the shared totals (seconds)
+VIDEO_CACHE_STATS_INTERVAL = int(os.getenv("VIDEO_CACHE_STATS_INTERVAL", 30))
+
+# Bytes relayed per write when proxying Drive video to the client
+VIDEO_STREAM_CHUNK_SIZE = int(os.getenv("VIDEO_STREAM_CHUNK_SIZE", 256 * 1024))
+# Document -> PDF conversion (utils/libreoffice.py)
+LIBREOFFICE_PATH = os.getenv("LIBREOFFICE_PATH") or shutil.which("soffice") or shutil.which("libreoffice")
+# Warm soffice instances per worker process (prefork children each get their own)
+LIBREOFFICE_POOL_SIZE = int(os.getenv("LIBREOFFICE_POOL_SIZE", 1))
+# Restart an instance with a fresh profile after this many conversions
+LIBREOFFICE_MAX_CONVERSIONS = int(os.getenv("LIBREOFFICE_MAX_CONVERSIONS", 50))
+LIBREOFFICE_CONVERT_TIMEOUT = int(os.getenv("LIBREOFFICE_CONVERT_TIMEOUT", 120))
+
+# Lifetime (seconds) of signed video stream URLs from /api/lessons/<id>/stream_url/
+STREAM_URL_TTL = int(os.getenv("STREAM_URL_TTL", 4 * 60 * 60))
+# Route /api/lessons/<id>/stream/ to the async view (serve core.asgi with uvicorn)
+VIDEO_STREAM_ASYNC = os.getenv("VIDEO_STREAM_ASYNC", "False").lower() in ("true", "1", "yes")
 
 UNFOLD = {
     "SITE_TITLE": "SkillSigma Admin",
@@ -0,0 +1,34 @@
+import base64
+import json
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.pagination import KeysetPagination
+from courses.models import AIConversation
+
+
+def encode_cursor(values, reverse=False):
+    token = json.dumps({'v': values, 'r': reverse}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(token.encode()).decode().rstrip('=')
+
+
+class KeysetCursorTests(SimpleTestCase):
+    view = SimpleNamespace(cursor_ordering=('-created_at', '-id'))
+
+    def paginate(self, cursor):
+        request = Request(APIRequestFactory().get('/api/ai-conversations/', {'cursor': cursor}))
+        return KeysetPagination().paginate_queryset(AIConversation.objects.all(), request, self.view)
+
+    def test_tampered_cursor_values_are_not_found(self):
+        for values in (['garbage', 'x'], ['2026-01-01T00:00:00+00:00', 'x'], ['garbage', '1']):
+            with self.subTest(values=values), self.assertRaises(NotFound):
+                self.paginate(encode_cursor(values))
+
+    def test_malformed_cursors_are_not_found(self):
+        for cursor in ('%%%', encode_cursor(['1']), base64.urlsafe_b64encode(b'not json').decode()):
+            with self.subTest(cursor=cursor), self.assertRaises(NotFound):
+                self.paginate(cursor)
@@ -2,6 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from accounts.views import UserViewSet, StudentGroupViewSet,InstructorViewSet,AdminViewSet
 from courses.views import CourseViewSet, LessonViewSet,CategoryViewSet,LessonProgressViewSet,LessonVideoStreamView,AIConversationViewSet
+from courses.async_views import lesson_video_stream_async
 from enrollments.views import EnrollmentViewSet, GroupEnrollmentViewSet
 from quizzes.views import QuizViewSet, QuestionViewSet, OptionViewSet, SubmissionViewSet
 from certificates.views import CertificateViewSet
@@ -47,5 +48,10 @@ urlpatterns = [
     path('api/', include(courses_router.urls)),
     path("api/auth/", include("accounts.jwt_urls")),
     path('silk/', include('silk.urls', namespace='silk')),
-    path('api/lessons/<int:lesson_id>/stream/', LessonVideoStreamView.as_view(), name='lesson-video-stream'),
+    path(
+        'api/lessons/<int:lesson_id>/stream/',
+        # The async view only pays off under ASGI (uvicorn core.asgi:application)
+        lesson_video_stream_async if settings.VIDEO_STREAM_ASYNC else LessonVideoStreamView.as_view(),
+        name='lesson-video-stream',
+    ),
 ]+static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,11 +1,13 @@
 from django.contrib import admin
-from .models import Course,Lesson,Category ,LessonProgress,AIConversation
+from .models import Course,Lesson,Category ,LessonProgress,AIConversation,AIConversationMessage,ContentArtifact
 from accounts.models import User
 # Register your models here.
 admin.site.register(Lesson)
 admin.site.register(Category)
 admin.site.register(LessonProgress)
 admin.site.register(AIConversation)
+admin.site.register(AIConversationMessage)
+admin.site.register(ContentArtifact)
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
     list_display = ("title", "created_at")
@@ -0,0 +1,156 @@
+# courses/async_views.py
+"""
+Async variant of LessonVideoStreamView for ASGI deployments (core/asgi.py).
+
+The sync view holds a worker thread for as long as a viewer keeps the video
+playing. Here the relay loop is a coroutine: while waiting on Drive or on a
+slow client it costs only a suspended task, so one process can keep thousands
+of streams open. ASGI servers apply back-pressure on ``send``, so at most one
+chunk per stream is buffered no matter how slowly the client reads.
+
+Enabled by VIDEO_STREAM_ASYNC (see core/urls.py).
+"""
+import asyncio
+import re
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+from utils import drive_service
+from utils.video_cache import get_video_cache, RangeNotSatisfiable, UpstreamError
+from .auth import QueryStringJWTAuthentication, verify_stream_params
+from .cache import get_lesson_video_url
+from .models import Lesson
+
+# Headers the video player needs to seek
+FORWARDED_HEADERS = ('Content-Length', 'Content-Range', 'Accept-Ranges')
+
+_clients = {}
+
+
+def get_async_client():
+    """One pooled httpx client per event loop (uvicorn runs one per process)."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            # No cap on concurrent streams; keep a warm pool for the next ones
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=100),
+        )
+        _clients[loop] = client
+    return client
+
+
+def _resolve_stream(request, lesson_id):
+    """
+    Sync part of the request (auth + cached lesson lookup), run in a thread.
+    Returns the Drive file id, or an HttpResponse to send instead.
+    """
+    try:
+        # Signed URLs are verified without a database query; fall back to JWT
+        grant = verify_stream_params(request.GET, lesson_id)
+        if grant is None:
+            auth = QueryStringJWTAuthentication().authenticate(Request(request))
+            grant = auth[0] if auth else None
+    except APIException:
+        grant = None
+    if grant is None or not grant.is_authenticated:
+        return HttpResponse("Authentication credentials were not provided.", status=401)
+
+    try:
+        video_url = get_lesson_video_url(lesson_id)
+    except Lesson.DoesNotExist:
+        return HttpResponse("Lesson not found.", status=404)
+    if not video_url:
+        return HttpResponse("No video available for this lesson.", status=404)
+
+    file_id = drive_service.drive_file_id_from_url(video_url)
+    if file_id is None:
+        return HttpResponse("Invalid Video URL format in database.", status=500)
+    return file_id
+
+
+async def lesson_video_stream_async(request, lesson_id):
+    resolved = await sync_to_async(_resolve_stream)(request, lesson_id)
+    if isinstance(resolved, HttpResponse):
+        return resolved
+    file_id = resolved
+    range_header = request.headers.get('Range')
+
+    if settings.VIDEO_CACHE_MAX_BYTES and re.fullmatch(r'[A-Za-z0-9_-]+', file_id):
+        return await _stream_from_cache(file_id, range_header)
+    return await _stream_from_drive(file_id, range_header)
+
+
+async def _stream_from_drive(file_id, range_header):
+    creds = await sync_to_async(drive_service.get_credentials, thread_sensitive=False)()
+    headers = {'Authorization': f'Bearer {creds.token}'}
+    if range_header:
+        headers['Range'] = range_header
+
+    client = get_async_client()
+    upstream_request = client.build_request(
+        'GET', f"{drive_service.DRIVE_API_URL}/files/{file_id}?alt=media", headers=headers
+    )
+    try:
+        upstream = await client.send(upstream_request, stream=True)
+    except httpx.HTTPError as e:
+        print(f"Streaming Error: {e}")
+        return HttpResponse("Internal Server Error while streaming.", status=500)
+
+    if upstream.status_code >= 400:
+        await upstream.aclose()
+        return HttpResponse(f"Upstream Error from Drive: {upstream.status_code}", status=upstream.status_code)
+
+    response = StreamingHttpResponse(
+        _relay(upstream),
+        status=upstream.status_code,
+        content_type=upstream.headers.get('Content-Type', 'video/mp4'),
+    )
+    for header in FORWARDED_HEADERS:
+        if header in upstream.headers:
+            response[header] = upstream.headers[header]
+    return response
+
+
+async def _relay(upstream):
+    # Runs until the body ends or the client disconnects (Django then cancels
+    # the response task and the finally block releases the upstream connection)
+    try:
+        async for chunk in upstream.aiter_bytes(settings.VIDEO_STREAM_CHUNK_SIZE):
+            yield chunk
+    finally:
+        await upstream.aclose()
+
+
+async def _stream_from_cache(file_id, range_header):
+    cache = get_video_cache()
+    try:
+        cached = await sync_to_async(cache.open_range, thread_sensitive=False)(file_id, range_header)
+    except UpstreamError as e:
+        return HttpResponse(f"Upstream Error from Drive: {e.status}", status=e.status)
+    except RangeNotSatisfiable as e:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{e.total}'
+        return response
+
+    response = StreamingHttpResponse(_iter_cached(cached), status=cached.status, content_type=cached.content_type)
+    for header, value in cached.headers.items():
+        response[header] = value
+    return response
+
+
+async def _iter_cached(cached):
+    # Chunk reads (and any upstream fill) are blocking IO: do them off the loop
+    chunks = iter(cached)
+    next_chunk = sync_to_async(next, thread_sensitive=False)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
@@ -0,0 +1,227 @@
+# courses/cache.py
+"""
+Two-layer cache behind CourseViewSet list/detail.
+
+1. Structure: the user-independent serialized course tree (lessons, quizzes,
+   categories, instructors), keyed by a per-course version token.
+2. User state: one user's progress, completed lessons and submitted quizzes
+   for a course, keyed by the course version plus a per-user token.
+
+Signals in courses/signals.py bump the tokens whenever the underlying rows
+change, so a cached entry is never served stale; old entries simply age out.
+Bumps (and the other invalidations here) wait for the surrounding
+transaction to commit: a reader that rebuilt an entry from the old rows
+in the meantime wrote it under the old token, where it is never read again.
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+STRUCTURE_TIMEOUT = 60 * 60 * 24
+USER_STATE_TIMEOUT = 60 * 60
+VIDEO_URL_TIMEOUT = 60 * 60
+TUTOR_CONTEXT_TIMEOUT = 60 * 60
+# Tenants have no invalidation hook; persona edits show up within this window
+PERSONA_TIMEOUT = 5 * 60
+
+
+def _course_version_key(course_id):
+    return f"courses:course:{course_id}:version"
+
+
+def _user_version_key(user_id):
+    return f"courses:user:{user_id}:version"
+
+
+def _bump_on_commit(keys):
+    # Tokens are minted in the callback so each commit gets its own
+    if keys:
+        transaction.on_commit(lambda: cache.set_many({key: uuid.uuid4().hex for key in keys}, timeout=None))
+
+
+def bump_course_versions(course_ids):
+    """
+    Invalidates the cached structure (and every user's state) of these
+    courses once the current transaction commits.
+    """
+    _bump_on_commit({_course_version_key(course_id) for course_id in course_ids if course_id})
+
+
+def bump_user_state(user_id):
+    """Invalidates one user's cached progress/submissions for every course, on commit."""
+    _bump_on_commit({_user_version_key(user_id)})
+
+
+def _lesson_video_key(lesson_id):
+    return f"courses:lesson:{lesson_id}:video_url"
+
+
+def get_lesson_video_url(lesson_id):
+    """
+    The lesson's video_url ('' when it has none), cached so the video stream
+    view can serve range requests without touching the database.
+    Raises Lesson.DoesNotExist.
+    """
+    key = _lesson_video_key(lesson_id)
+    video_url = cache.get(key)
+    if video_url is None:
+        from .models import Lesson
+
+        video_url = Lesson.objects.only("video_url").get(pk=lesson_id).video_url or ""
+        cache.set(key, video_url, VIDEO_URL_TIMEOUT)
+    return video_url
+
+
+def forget_lesson_video_url(lesson_id):
+    key = _lesson_video_key(lesson_id)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def _tutor_context_key(lesson_id):
+    return f"courses:lesson:{lesson_id}:tutor_context"
+
+
+def get_lesson_tutor_context(lesson_id):
+    """
+    The lesson and course fields the AI tutor grounds a session in, cached per
+    lesson (signals drop it when the lesson or its course changes).
+    Raises Lesson.DoesNotExist.
+    """
+    key = _tutor_context_key(lesson_id)
+    context = cache.get(key)
+    if context is None:
+        from .models import Lesson
+
+        lesson = Lesson.objects.select_related("course").only(
+            "title", "ai_summary", "course__title"
+        ).get(pk=lesson_id)
+        context = {
+            "lesson_id": lesson.pk,
+            "lesson_title": lesson.title,
+            "lesson_summary": lesson.ai_summary,
+            "course_id": lesson.course_id,
+            "course_title": lesson.course.title,
+        }
+        cache.set(key, context, TUTOR_CONTEXT_TIMEOUT)
+    return context
+
+
+def forget_lesson_tutor_contexts(lesson_ids):
+    keys = [_tutor_context_key(lesson_id) for lesson_id in lesson_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def get_tenant_persona(tenant_id):
+    """The tenant's ai_persona_prompt, or None for users without a tenant."""
+    if tenant_id is None:
+        return None
+    key = f"tenants:{tenant_id}:ai_persona_prompt"
+    persona = cache.get(key)
+    if persona is None:
+        from tenants.models import Tenant
+
+        persona = Tenant.objects.filter(pk=tenant_id).values_list("ai_persona_prompt", flat=True).first() or ""
+        cache.set(key, persona, PERSONA_TIMEOUT)
+    return persona or None
+
+
+def _get_versions(keys):
+    """Reads version tokens, minting a fresh one for any that are missing."""
+    versions = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return versions
+
+
+def get_serialized_courses(course_ids, context):
+    """
+    Returns CourseSerializer output for ``course_ids`` (in that order), built
+    from the two cache layers and filling whatever is missing from the database.
+    """
+    request = context["request"]
+    user = request.user
+    user_id = user.id if user.is_authenticated else None
+    origin = request.build_absolute_uri("/")
+
+    version_keys = {cid: _course_version_key(cid) for cid in course_ids}
+    user_key = _user_version_key(user_id)
+    versions = _get_versions(list(version_keys.values()) + [user_key])
+
+    structure_keys = {
+        cid: f"courses:structure:{cid}:{versions[version_keys[cid]]}:{origin}"
+        for cid in course_ids
+    }
+    state_keys = {
+        cid: f"courses:state:{cid}:{user_id}:{versions[version_keys[cid]]}:{versions[user_key]}"
+        for cid in course_ids
+    } if user_id else {}
+    cached = cache.get_many(list(structure_keys.values()) + list(state_keys.values()))
+
+    structures = {cid: cached[key] for cid, key in structure_keys.items() if key in cached}
+    missing = [cid for cid in course_ids if cid not in structures]
+    if missing:
+        fresh = _serialize_structures(missing, context)
+        cache.set_many({structure_keys[cid]: data for cid, data in fresh.items()}, STRUCTURE_TIMEOUT)
+        structures.update(fresh)
+
+    states = {cid: cached[key] for cid, key in state_keys.items() if key in cached}
+    missing = [cid for cid in state_keys if cid not in states]
+    if missing:
+        fresh = _load_user_states(user, missing)
+        cache.set_many({state_keys[cid]: state for cid, state in fresh.items()}, USER_STATE_TIMEOUT)
+        states.update(fresh)
+
+    return [
+        _apply_user_state(structures[cid], states.get(cid))
+        for cid in course_ids if cid in structures
+    ]
+
+
+def _serialize_structures(course_ids, context):
+    from .models import Course
+    from .serializers import CourseSerializer, course_tree_prefetches
+
+    courses = Course.objects.filter(id__in=course_ids).prefetch_related(*course_tree_prefetches())
+    serializer = CourseSerializer(
+        courses, many=True, context={**context, "include_user_state": False}
+    )
+    return {course["id"]: course for course in serializer.data}
+
+
+def _load_user_states(user, course_ids):
+    from enrollments.models import Enrollment
+    from quizzes.models import Submission
+    from .models import LessonProgress
+
+    states = {cid: {"progress": 0, "lessons": set(), "quizzes": set()} for cid in course_ids}
+    for course_id, progress in Enrollment.objects.filter(
+        student=user, course_id__in=course_ids
+    ).values_list("course_id", "progress"):
+        states[course_id]["progress"] = progress
+    for course_id, lesson_id in LessonProgress.objects.filter(
+        student=user, lesson__course_id__in=course_ids, is_completed=True
+    ).values_list("lesson__course_id", "lesson_id"):
+        states[course_id]["lessons"].add(lesson_id)
+    for course_id, quiz_id in Submission.objects.filter(
+        student=user, quiz__course_id__in=course_ids
+    ).values_list("quiz__course_id", "quiz_id"):
+        states[course_id]["quizzes"].add(quiz_id)
+    return states
+
+
+def _apply_user_state(structure, state):
+    data = dict(structure)
+    if state is None:
+        return data
+    data["progress"] = state["progress"]
+    data["lessons"] = [
+        {**lesson, "is_completed": lesson["id"] in state["lessons"]} for lesson in structure["lessons"]
+    ]
+    data["quizzes"] = [
+        {**quiz, "is_completed": quiz["id"] in state["quizzes"]} for quiz in structure["quizzes"]
+    ]
+    return data
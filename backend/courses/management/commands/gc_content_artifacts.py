@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from courses.models import ContentArtifact
+
+
+class Command(BaseCommand):
+    help = "Deletes content artifacts (shared lesson documents, PDFs, summaries) no lesson references any more."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-age-hours", type=int, default=24,
+                            help="Keep unreferenced artifacts younger than this (uploads still in flight).")
+        parser.add_argument("--recount", action="store_true",
+                            help="Recompute ref_count from the lessons table before collecting.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report what would be deleted without deleting it.")
+
+    def handle(self, *args, **options):
+        if options["recount"]:
+            self._recount(options["dry_run"])
+
+        cutoff = timezone.now() - timedelta(hours=options["min_age_hours"])
+        # Double-check against the lessons table so a drifted counter never deletes live files
+        garbage = ContentArtifact.objects.filter(ref_count=0, created_at__lt=cutoff).annotate(
+            lesson_count=Count("lessons")
+        ).filter(lesson_count=0)
+
+        deleted = freed = 0
+        for artifact in garbage.iterator():
+            for field in (artifact.content_file, artifact.pdf_version):
+                if field:
+                    freed += field.size if field.storage.exists(field.name) else 0
+                    if not options["dry_run"]:
+                        field.delete(save=False)
+            if not options["dry_run"]:
+                artifact.delete()
+            deleted += 1
+
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {deleted} artifacts ({freed} bytes)."))
+
+    def _recount(self, dry_run):
+        drifted = ContentArtifact.objects.annotate(lesson_count=Count("lessons")).filter(
+            ~Q(ref_count=F("lesson_count"))
+        )
+        fixed = 0
+        for artifact in drifted.iterator():
+            fixed += 1
+            if not dry_run:
+                ContentArtifact.objects.filter(pk=artifact.pk).update(ref_count=artifact.lesson_count)
+        self.stdout.write(f"Recounted references: {fixed} artifacts drifted.")
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from courses.models import AIConversation
+
+
+class Command(BaseCommand):
+    help = "Moves AI tutor transcripts from the legacy JSON column into AIConversationMessage rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200,
+                            help="Conversations to load and migrate per transaction.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report what would be migrated without writing anything.")
+
+    def handle(self, *args, **options):
+        # Walk the table by primary key, one batch in memory at a time; each
+        # batch commits on its own, so an interrupted run can simply be resumed
+        pending = AIConversation.objects.filter(message_count=0).exclude(transcript=[]).order_by("id")
+        last_id = 0
+        conversations = messages = 0
+        while True:
+            ids = list(pending.filter(id__gt=last_id).values_list("id", flat=True)[:options["batch_size"]])
+            if not ids:
+                break
+            last_id = ids[-1]
+            with transaction.atomic():
+                for conversation in pending.select_for_update().filter(id__in=ids):
+                    if options["dry_run"]:
+                        moved = len(conversation.transcript)
+                    else:
+                        moved = conversation.migrate_transcript()
+                    conversations += 1 if moved else 0
+                    messages += moved
+            self.stdout.write(f"Up to conversation {last_id}: {conversations} conversations, {messages} messages.")
+
+        verb = "Would migrate" if options["dry_run"] else "Migrated"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {messages} messages from {conversations} conversations."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from utils.video_cache import shared_stats
+
+
+class Command(BaseCommand):
+    help = "Reports the lesson video chunk cache's hit/miss counters, summed over every worker."
+
+    def handle(self, *args, **options):
+        stats = shared_stats()
+        lookups = stats["hits"] + stats["misses"]
+        served = stats["hit_bytes"] + stats["miss_bytes"]
+        for name, value in stats.items():
+            self.stdout.write(f"{name}: {value}")
+        if lookups:
+            self.stdout.write(self.style.SUCCESS(
+                f"Hit ratio {stats['hits'] / lookups:.1%} of chunk reads, "
+                f"{stats['hit_bytes'] / served:.1%} of bytes served."
+            ))
+        else:
+            self.stdout.write("No cache reads recorded yet.")
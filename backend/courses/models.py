@@ -1,7 +1,11 @@
-from django.db import models, transaction
+import hashlib
+import os
+
+from django.db import models, transaction, IntegrityError
 from django.conf import settings
 from django.utils import timezone
 from celery import chain
+from core.mixins import DirtyFieldsMixin
 from .tasks import convert_lesson_to_pdf,process_lesson_ai_summary
 
 class Category(models.Model):
@@ -31,7 +35,60 @@ class Course(models.Model):
         return self.title
 
 
-class Lesson(models.Model):
+def _artifact_upload_to(instance, filename):
+    return f"lessons/artifacts/{instance.sha256[:2]}/{filename}"
+
+
+class ContentArtifactManager(models.Manager):
+    def intern(self, upload):
+        """
+        Returns (artifact, created) for the content of ``upload``, storing the
+        file only if no artifact with the same SHA-256 exists yet. The hash is
+        computed chunk by chunk, so large uploads are never read into memory.
+        """
+        digest = hashlib.sha256()
+        for chunk in upload.chunks():
+            digest.update(chunk)
+        sha256 = digest.hexdigest()
+
+        artifact = self.filter(sha256=sha256).first()
+        if artifact:
+            return artifact, False
+
+        ext = os.path.splitext(upload.name)[1].lower()
+        artifact = self.model(sha256=sha256)
+        artifact.content_file.save(f"{sha256}{ext}", upload, save=False)
+        try:
+            with transaction.atomic():
+                artifact.save()
+        except IntegrityError:
+            # A concurrent upload of the same file won the race
+            artifact.content_file.delete(save=False)
+            return self.get(sha256=sha256), False
+        return artifact, True
+
+
+class ContentArtifact(models.Model):
+    """
+    Content-addressed lesson document plus everything derived from it. Lessons
+    uploading identical bytes share one artifact, so the PDF conversion and AI
+    summary run once per distinct file. ``ref_count`` counts the lessons
+    pointing here; unreferenced artifacts are removed by ``gc_content_artifacts``.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    content_file = models.FileField(upload_to=_artifact_upload_to)
+    pdf_version = models.FileField(upload_to=_artifact_upload_to, null=True, blank=True)
+    ai_summary = models.TextField(blank=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ContentArtifactManager()
+
+    def __str__(self):
+        return self.sha256
+
+
+class Lesson(DirtyFieldsMixin, models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
         ('processing', 'Processing'),
@@ -50,6 +107,13 @@ class Lesson(models.Model):
         choices=STATUS_CHOICES, 
         default='pending'
     )
+    # Gemini analysis of the uploaded video; runs alongside the Drive upload
+    # tracked by video_status (see courses.tasks.process_lesson_video)
+    video_ai_status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending'
+    )
     video_file_temp = models.FileField(
         upload_to="lessons/temp_videos/", 
         null=True, 
@@ -59,6 +123,18 @@ class Lesson(models.Model):
     resources = models.FileField(upload_to="lessons/resources/", null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     is_processed = models.BooleanField(default=False)
+    ai_summary = models.TextField(blank=True)
+    # Bumped on every new upload; a task started for an older generation is
+    # stale and must not write its result (see bump_generation)
+    content_generation = models.PositiveIntegerField(default=0, editable=False)
+    video_generation = models.PositiveIntegerField(default=0, editable=False)
+    content_artifact = models.ForeignKey(
+        ContentArtifact,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='lessons',
+    )
     # NEW: Prerequisite Logic (String reference avoids circular imports)
     prerequisite_quiz = models.ForeignKey(
         'quizzes.Quiz', 
@@ -80,34 +156,80 @@ class Lesson(models.Model):
     def __str__(self):
         return f"{self.course.title} - {self.title}"
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._original_content_file = self.content_file
+    def _use_content_artifact(self):
+        """
+        Points a new content_file at its shared ContentArtifact, reusing the
+        artifact's PDF and summary when an identical file was converted before.
+        Returns the names of the fields it changed.
+        """
+        if not self.content_file:
+            self.content_artifact = None
+            return ['content_artifact']
+        if self.content_file._committed:
+            return []  # an existing stored name was assigned, not an upload
+
+        artifact, _ = ContentArtifact.objects.intern(self.content_file.file)
+        self.content_artifact = artifact
+        self.content_file = artifact.content_file.name
+        self.pdf_version = artifact.pdf_version.name or None
+        self.ai_summary = artifact.ai_summary
+        changed = ['content_artifact', 'content_file', 'pdf_version', 'ai_summary']
+        if artifact.pdf_version:
+            self.processing_status = 'completed'
+            changed.append('processing_status')
+        return changed
+
+    def bump_generation(self, field):
+        """
+        Atomically increments ``content_generation`` or ``video_generation`` and
+        returns the new value, which the processing tasks started for this
+        upload carry along. The read and the write happen under one row lock,
+        so concurrent saves always get distinct generations.
+        """
+        with transaction.atomic():
+            current = Lesson.objects.select_for_update().values_list(field, flat=True).get(pk=self.pk)
+            value = current + 1
+            Lesson.objects.filter(pk=self.pk).update(**{field: value})
+        setattr(self, field, value)
+        self._loaded_values[field] = value
+        return value
 
     def save(self, *args, **kwargs):
         # Preserved your PDF conversion trigger logic
-        is_new_file = False
-        if self.pk:
-            old = Lesson.objects.get(pk=self.pk)
-            if old.content_file != self.content_file:
-                is_new_file = True
-        else:
-            is_new_file = True
-
-        if self.content_file and is_new_file:
-            ext = self.content_file.name.split('.')[-1].lower()
-            if ext in ['ppt', 'pptx', 'doc', 'docx', 'xls', 'xlsx']:
-                self.processing_status = 'processing' 
+        update_fields = kwargs.get('update_fields')
+        is_new_file = (
+            (update_fields is None or 'content_file' in update_fields)
+            and self.has_changed('content_file')
+        )
+
+        if is_new_file:
+            changed = self._use_content_artifact()
+            if self.content_file and not self.pdf_version:
+                ext = self.content_file.name.split('.')[-1].lower()
+                if ext in ['ppt', 'pptx', 'doc', 'docx', 'xls', 'xlsx']:
+                    self.processing_status = 'processing' 
+                    changed.append('processing_status')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *changed}
 
         super().save(*args, **kwargs)
 
-        if self.content_file and is_new_file and self.processing_status == 'processing':
-            transaction.on_commit(lambda: chain(
-                convert_lesson_to_pdf.s(self.id),
-                process_lesson_ai_summary.s(self.id)
-            ).apply_async())
+        if is_new_file:
+            # Also makes runs still working on the previous file stale
+            generation = self.bump_generation('content_generation')
+            if self.content_file and self.processing_status == 'processing':
+                transaction.on_commit(lambda: chain(
+                    convert_lesson_to_pdf.s(self.id, generation),
+                    process_lesson_ai_summary.s(self.id, generation)
+                ).apply_async())
+            elif self.content_artifact_id and self.pdf_version and not self.ai_summary:
+                # Reused PDF whose summary is still running (or failed) for the
+                # first upload: summarize it here too, reusing it if it lands first
+                transaction.on_commit(lambda: process_lesson_ai_summary.s(
+                    "Reused PDF", self.id, generation
+                ).apply_async())
                 
-class LessonProgress(models.Model):
+class LessonProgress(DirtyFieldsMixin, models.Model):
     student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="lesson_progress")
     lesson = models.ForeignKey('Lesson', on_delete=models.CASCADE, related_name="progress") # Used string 'Lesson' to avoid circular import issues
     
@@ -129,6 +251,10 @@ class LessonProgress(models.Model):
         elif not self.is_completed:
             # Optional: Reset time if they un-complete the lesson
             self.completed_at = None 
+        # update_or_create() saves only its defaults; keep the timestamp in step
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.has_changed('completed_at'):
+            kwargs['update_fields'] = {*update_fields, 'completed_at'}
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -138,9 +264,11 @@ class AIConversation(models.Model):
     student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="ai_sessions")
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name="ai_sessions")
     session_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
-    # Store the full chat history as a JSON list
-    # Format: [{"role": "user", "content": "..."}, {"role": "model", "content": "..."}]
+    # Legacy: the full chat history as one JSON list, [{"role": "user", "text": "..."}, ...].
+    # Messages now live in AIConversationMessage; migrate_ai_transcripts moves old ones over
     transcript = models.JSONField(default=list)
+    # Number of AIConversationMessage rows; the next message's seq
+    message_count = models.PositiveIntegerField(default=0, editable=False)
     
     # AI-generated summary of the student's performance
     summary = models.TextField(blank=True, null=True)
@@ -150,5 +278,70 @@ class AIConversation(models.Model):
     tenant = models.ForeignKey('tenants.Tenant', on_delete=models.CASCADE, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # A student's history, newest first; also the keyset pagination key
+            models.Index(fields=['student', 'created_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"AI Session: {self.student.username} - {self.lesson.title}"
+
+    def append_messages(self, messages, created_at=None):
+        """
+        Stores ``messages`` (dicts with role and text) after the existing ones.
+        Call inside a transaction holding this row's lock (select_for_update),
+        which keeps seq gapless under concurrent appends.
+        """
+        start = self.message_count
+        AIConversationMessage.objects.bulk_create([
+            AIConversationMessage(
+                conversation=self,
+                seq=start + offset,
+                role=message['role'],
+                text=message['text'],
+                created_at=created_at or timezone.now(),
+            )
+            for offset, message in enumerate(messages)
+        ])
+        self.message_count = start + len(messages)
+        self.save(update_fields=['message_count'])
+
+    def migrate_transcript(self):
+        """
+        Moves a legacy JSON transcript into message rows and empties it.
+        Same locking rules as append_messages. Returns the messages moved.
+        """
+        if self.message_count or not self.transcript:
+            return 0
+        messages = [
+            {
+                'role': 'user' if item.get('role') == 'user' else 'ai',
+                'text': item.get('text', item.get('content')) or '',
+            }
+            for item in self.transcript
+        ]
+        self.append_messages(messages, created_at=self.created_at)
+        self.transcript = []
+        self.save(update_fields=['transcript'])
+        return len(messages)
+
+
+class AIConversationMessage(models.Model):
+    ROLE_CHOICES = (
+        ('user', 'User'),
+        ('ai', 'AI'),
+    )
+    conversation = models.ForeignKey(AIConversation, on_delete=models.CASCADE, related_name="messages")
+    seq = models.PositiveIntegerField()
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    text = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['seq']
+        # Also the index behind transcript paging and last-message lookups
+        unique_together = ('conversation', 'seq')
+
     def __str__(self):
-        return f"AI Session: {self.student.username} - {self.lesson.title}"
\ No newline at end of file
+        return f"{self.conversation_id} #{self.seq} ({self.role})"
\ No newline at end of file
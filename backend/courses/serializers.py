@@ -1,14 +1,85 @@
-import json
-
 from rest_framework import serializers
-from .models import Course, Lesson, Category,LessonProgress,AIConversation
+from .models import Course, Lesson, Category,LessonProgress,AIConversation,AIConversationMessage
 from accounts.models import User
+from accounts.mixins import SparseFieldsMixin
 from quizzes.models import Quiz,Submission
 from enrollments.models import Enrollment
 from django.db.models import Prefetch
 from django.db import transaction
-from .tasks import upload_lesson_video_to_drive
-class CourseQuizSerializer(serializers.ModelSerializer):
+from django.utils.functional import cached_property
+from .tasks import process_lesson_video
+
+
+class UserCourseState:
+    """
+    The requesting user's enrollments, completed lessons and quiz submissions,
+    loaded lazily with one query per kind and shared by every serializer of a
+    request through the context. Lets the per-user SerializerMethodFields below
+    answer from memory wherever the course tree is nested (course lists,
+    enrollments, certificates) instead of querying once per row.
+    """
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def _progress_by_course(self):
+        return dict(Enrollment.objects.filter(student=self.user).values_list('course_id', 'progress'))
+
+    @cached_property
+    def _completed_lesson_ids(self):
+        return set(LessonProgress.objects.filter(
+            student=self.user, is_completed=True
+        ).values_list('lesson_id', flat=True))
+
+    @cached_property
+    def _submitted_quiz_ids(self):
+        return set(Submission.objects.filter(student=self.user).values_list('quiz_id', flat=True))
+
+    def progress(self, course_id):
+        return self._progress_by_course.get(course_id, 0)
+
+    def lesson_completed(self, lesson_id):
+        return lesson_id in self._completed_lesson_ids
+
+    def quiz_submitted(self, quiz_id):
+        return quiz_id in self._submitted_quiz_ids
+
+
+def get_user_state(context):
+    """
+    Returns the request-wide UserCourseState, or None when there is no
+    authenticated user (or the caller asked to leave user state out).
+    """
+    request = context.get('request')
+    if not (request and request.user.is_authenticated and context.get('include_user_state', True)):
+        return None
+    # Nested serializers share the root's context dict, so this is created once
+    if 'user_state' not in context:
+        context['user_state'] = UserCourseState(request.user)
+    return context['user_state']
+
+
+def course_tree_prefetches(prefix='', requested=None):
+    """
+    Prefetches that let CourseSerializer render courses reached through
+    ``prefix`` (e.g. 'course__') without per-row queries. ``requested`` is an
+    optional predicate on CourseSerializer field names (see SparseFieldsViewMixin)
+    used to skip prefetches for fields that will not be serialized.
+    """
+    requested = requested or (lambda name: True)
+    prefetches = []
+    if requested('lessons'):
+        prefetches.append(Prefetch(f'{prefix}lessons', queryset=Lesson.objects.select_related('prerequisite_quiz')))
+    if requested('quizzes'):
+        quizzes = Quiz.objects.all()
+        if requested('quizzes.questions'):
+            quizzes = quizzes.prefetch_related('questions')
+        prefetches.append(Prefetch(f'{prefix}quizzes', queryset=quizzes))
+    prefetches += [f'{prefix}{name}' for name in ('categories', 'instructors') if requested(name)]
+    return prefetches
+
+
+class CourseQuizSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     is_completed = serializers.SerializerMethodField()
     
     class Meta:
@@ -16,14 +87,14 @@ class CourseQuizSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'description', 'prerequisite_lesson', "questions", "is_completed",]
 
     def get_is_completed(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            if hasattr(obj, 'user_submissions'):
-                return any(s.student_id == request.user.id for s in obj.user_submissions)
-            return Submission.objects.filter(student=request.user, quiz=obj).exists()
-        return False
+        state = get_user_state(self.context)
+        if state is None:
+            return False
+        if hasattr(obj, 'user_submissions'):
+            return any(s.student_id == state.user.id for s in obj.user_submissions)
+        return state.quiz_submitted(obj.id)
         
-class LessonSerializer(serializers.ModelSerializer):
+class LessonSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     course = serializers.PrimaryKeyRelatedField(read_only=True)
     prerequisite_quiz_title = serializers.ReadOnlyField(source='prerequisite_quiz.title')
     is_completed = serializers.SerializerMethodField()
@@ -41,9 +112,10 @@ class LessonSerializer(serializers.ModelSerializer):
             'prerequisite_quiz', 'prerequisite_quiz_title', 'prerequisite_score',
             'is_completed',
             'video_status',
+            'video_ai_status',
             'video_file_temp',
         ]
-        read_only_fields = ['video_status', 'video_url', 'processing_status', 'pdf_version']
+        read_only_fields = ['video_status', 'video_ai_status', 'video_url', 'processing_status', 'pdf_version']
 
     def create(self, validated_data):
         course = self.context.get('course')
@@ -57,13 +129,15 @@ class LessonSerializer(serializers.ModelSerializer):
         if has_video:
             # Set status immediately so frontend knows it's working
             validated_data['video_status'] = 'processing'
+            validated_data['video_ai_status'] = 'processing'
 
         # 3. Create the instance (Just once!)
         lesson = super().create(validated_data)
 
         # 4. Trigger Celery Task (After DB commit)
         if has_video:
-            transaction.on_commit(lambda: upload_lesson_video_to_drive.delay(lesson.id))
+            generation = lesson.bump_generation('video_generation')
+            transaction.on_commit(lambda: process_lesson_video(lesson.id, generation))
             
         return lesson
 
@@ -76,30 +150,38 @@ class LessonSerializer(serializers.ModelSerializer):
             
         if has_new_video:
             validated_data['video_status'] = 'processing'
+            validated_data['video_ai_status'] = 'processing'
             # Optional: Clear old URL while processing new one
             # validated_data['video_url'] = '' 
 
+        # The upload being replaced; its pipeline goes stale and never releases it
+        previous_video = instance.video_file_temp.name if has_new_video else None
+
         # 2. Update the instance
         lesson = super().update(instance, validated_data)
 
         # 3. Trigger Celery Task
         if has_new_video:
-            transaction.on_commit(lambda: upload_lesson_video_to_drive.delay(lesson.id))
+            generation = lesson.bump_generation('video_generation')
+            transaction.on_commit(lambda: process_lesson_video(lesson.id, generation))
+            if previous_video and previous_video != lesson.video_file_temp.name:
+                storage = lesson.video_file_temp.storage
+                transaction.on_commit(lambda: storage.delete(previous_video))
 
         return lesson
 
     def get_is_completed(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            # Optimization: Use prefetch_related data if available
-            if hasattr(obj, 'user_progress'):
-                return any(p.is_completed for p in obj.user_progress)
-            # Fallback query
-            return obj.progress.filter(student=request.user, is_completed=True).exists()
-        return False
+        state = get_user_state(self.context)
+        if state is None:
+            return False
+        # Optimization: Use prefetch_related data if available
+        if hasattr(obj, 'user_progress'):
+            return any(p.is_completed for p in obj.user_progress)
+        # Fallback: request-wide lookup (one query for the whole response)
+        return state.lesson_completed(obj.id)
     
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ["id", "name"]
@@ -109,7 +191,7 @@ class CategorySerializer(serializers.ModelSerializer):
         )
         return category
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     instructors = serializers.PrimaryKeyRelatedField(
         many=True,
         queryset=User.objects.filter(role="instructor"),
@@ -134,14 +216,13 @@ class CourseSerializer(serializers.ModelSerializer):
             "created_at", "instructors", "lessons","quizzes","progress"
         ]
     def get_progress(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                enrollment = Enrollment.objects.get(student=request.user, course=obj)
-                return enrollment.progress
-            except Enrollment.DoesNotExist:
-                return 0
-        return 0
+        state = get_user_state(self.context)
+        if state is None:
+            return 0
+        if hasattr(obj, 'current_user_enrollment'):
+            enrollment = next(iter(obj.current_user_enrollment), None)
+            return enrollment.progress if enrollment else 0
+        return state.progress(obj.id)
 
 class InstructorActionSerializer(serializers.Serializer):
     instructor_id = serializers.PrimaryKeyRelatedField(
@@ -150,7 +231,7 @@ class InstructorActionSerializer(serializers.Serializer):
         label="Instructor ID"
     )
     
-class LessonProgressSerializer(serializers.ModelSerializer):
+class LessonProgressSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     lesson_title = serializers.CharField(source='lesson.title', read_only=True)
 
     class Meta:
@@ -167,27 +248,59 @@ class LessonProgressSerializer(serializers.ModelSerializer):
         )
         return progress
 
+class AIConversationMessageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AIConversationMessage
+        fields = ['seq', 'role', 'text', 'created_at']
+
+
 # In your lessons/serializers.py
-class AIConversationSerializer(serializers.ModelSerializer):
+class AIConversationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Session metadata plus its latest message; the transcript itself is paged
+    from /ai-conversations/{id}/messages/.
+    """
+    last_message = serializers.SerializerMethodField()
+
     class Meta:
         model = AIConversation
-        fields = ['id', 'session_id', 'lesson', 'transcript', 'summary', 'created_at', 'tenant']
-        read_only_fields = ['id', 'tenant']
-
-    def validate_transcript(self, value):
-        """
-        DRF Field Hook: Runs instantly prior to both create and update validation checks.
-        Ensures string block arrays are converted completely back to standard Python lists
-        before any database driver interaction happens.
-        """
-        if isinstance(value, str):
-            try:
-                return json.loads(value)
-            except json.JSONDecodeError:
-                raise serializers.ValidationError("Invalid JSON text format string passed to transcript field.")
-        return value
+        fields = ['id', 'session_id', 'lesson', 'summary', 'message_count', 'last_message', 'created_at', 'tenant']
+        read_only_fields = ['id', 'tenant', 'message_count']
+
+    def get_last_message(self, obj):
+        # Filled by AIConversationViewSet's prefetch: at most one row
+        last = getattr(obj, 'last_messages', None)
+        if last is None:
+            last = list(obj.messages.filter(seq=obj.message_count - 1)) if obj.message_count else []
+        return AIConversationMessageSerializer(last[0]).data if last else None
+
+    def validate(self, attrs):
+        # Turns are stored as message rows now; refuse the legacy field rather
+        # than silently dropping it
+        if 'transcript' in self.initial_data:
+            raise serializers.ValidationError(
+                {'transcript': 'Post messages to /ai-conversations/append/ instead.'}
+            )
+        return attrs
 
     def create(self, validated_data):
         # Prevent keyword arg duplication issues safely
         student = validated_data.pop('student', None)
-        return AIConversation.objects.create(student=student, **validated_data)
\ No newline at end of file
+        return AIConversation.objects.create(student=student, **validated_data)
+
+
+class TranscriptMessageSerializer(serializers.Serializer):
+    role = serializers.ChoiceField(choices=['user', 'ai'])
+    text = serializers.CharField(allow_blank=True, trim_whitespace=False)
+
+
+class TranscriptAppendSerializer(serializers.Serializer):
+    """
+    A batch of new turns for AIConversationViewSet.append_messages. ``offset``
+    is how many messages the sender believes are already stored.
+    """
+    session_id = serializers.CharField(max_length=255)
+    lesson = serializers.PrimaryKeyRelatedField(queryset=Lesson.objects.all())
+    offset = serializers.IntegerField(min_value=0)
+    messages = TranscriptMessageSerializer(many=True, allow_empty=False)
+    summary = serializers.CharField(required=False, allow_blank=True)
@@ -1,43 +1,149 @@
 # courses/signals.py
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
-from .models import LessonProgress
+from .cache import bump_course_versions, bump_user_state, forget_lesson_tutor_contexts, forget_lesson_video_url
+from .models import LessonProgress, Course, Category, ContentArtifact
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
 from quizzes.models import Submission
 from enrollments.models import Enrollment
+from enrollments.tasks import schedule_course_progress_recompute
 from courses.models import Lesson
-from quizzes.models import Quiz
+from quizzes.models import Quiz, Question
 
-# Trigger when a Lesson is marked complete
+# Progress is tracked as completed/total counters on Enrollment. Each event below
+# shifts the counters of the affected enrollment(s) in a single UPDATE (quiz
+# submissions recount the one enrollment instead, see _recount_quiz_progress);
+# the `reconcile_progress` management command repairs any drift.
+
+# Trigger when a Lesson is marked complete (or un-completed)
 @receiver(post_save, sender=LessonProgress)
 def update_progress_on_lesson_complete(sender, instance, created, **kwargs):
+    # DirtyFieldsMixin still holds the pre-save values while post_save runs
+    changed = instance.is_completed if created else instance.has_changed('is_completed')
+    if not changed:
+        return
+    Enrollment.objects.filter(
+        student_id=instance.student_id,
+        course__lessons=instance.lesson_id
+    ).apply_progress_delta(completed=1 if instance.is_completed else -1)
+
+@receiver(post_delete, sender=LessonProgress)
+def update_progress_on_lesson_progress_delete(sender, instance, **kwargs):
     if instance.is_completed:
-        # Find the student's enrollment for this course
-        enrollment = Enrollment.objects.filter(
-            student=instance.student, 
-            course=instance.lesson.course
-        ).first()
-        
-        if enrollment:
-            enrollment.recalculate_progress()
-
-# Trigger when a Quiz is submitted
+        Enrollment.objects.filter(
+            student_id=instance.student_id,
+            course__lessons=instance.lesson_id
+        ).apply_progress_delta(completed=-1)
+
+# Trigger when a Quiz is submitted (only the first submission of a quiz counts)
 @receiver(post_save, sender=Submission)
 def update_progress_on_quiz_submission(sender, instance, created, **kwargs):
-    enrollment = Enrollment.objects.filter(
-        student=instance.student, 
-        course=instance.quiz.course
-    ).first()
-    
-    if enrollment:
-        enrollment.recalculate_progress()
-
-# Optional: Recalculate if a teacher adds/removes lessons (changes the total count)
+    if created:
+        _recount_quiz_progress(instance)
+
+@receiver(post_delete, sender=Submission)
+def update_progress_on_submission_delete(sender, instance, **kwargs):
+    _recount_quiz_progress(instance)
+
+def _recount_quiz_progress(submission):
+    """
+    Whether a submission moves progress depends on the student's other
+    submissions of the quiz, which a concurrent request may be writing at the
+    same moment, so a "first submission?" check followed by a delta can
+    count the quiz twice (or not at all). Instead, lock the enrollment row and
+    recount it: the handler that gets the lock last sees every committed
+    submission, so the quiz is counted exactly once.
+    """
+    with transaction.atomic():
+        locked = Enrollment.objects.select_for_update(of=('self',)).filter(
+            student_id=submission.student_id,
+            course__quizzes=submission.quiz_id
+        ).values_list('id', flat=True)
+        ids = list(locked)
+        if ids:
+            Enrollment.objects.filter(pk__in=ids).recompute_progress()
+
+# Recalculate if a teacher adds/removes lessons (changes the total count).
+# Runs as a debounced background job, so a burst of edits costs one recompute.
+@receiver([post_save, post_delete], sender=Lesson)
+@receiver([post_save, post_delete], sender=Quiz)
+def update_all_enrollments_on_content_change(sender, instance, created=False, **kwargs):
+    # Plain edits of an existing lesson/quiz leave the item counts untouched
+    if kwargs['signal'] is post_save and not created:
+        return
+    schedule_course_progress_recompute(instance.course_id)
+
+
+# --- Course catalog cache invalidation (see courses/cache.py) ---
+
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_course_cache(sender, instance, **kwargs):
+    bump_course_versions([instance.pk])
+
+@receiver(post_save, sender=Course)
+def invalidate_tutor_contexts_on_course_change(sender, instance, **kwargs):
+    forget_lesson_tutor_contexts(instance.lessons.values_list('id', flat=True))
+
 @receiver([post_save, post_delete], sender=Lesson)
 @receiver([post_save, post_delete], sender=Quiz)
-def update_all_enrollments_on_content_change(sender, instance, **kwargs):
-    # This is heavier, but ensures accuracy if a teacher adds a lesson 
-    # to a live course. 
-    course = instance.course
-    # Update all students enrolled in this course
-    for enrollment in course.enrollments.all():
-        enrollment.recalculate_progress()
\ No newline at end of file
+def invalidate_course_cache_on_content_change(sender, instance, **kwargs):
+    bump_course_versions([instance.course_id])
+
+# Reference counts of shared lesson documents (see ContentArtifact)
+def _shift_artifact_refs(artifact_id, delta):
+    if artifact_id:
+        ContentArtifact.objects.filter(pk=artifact_id).update(ref_count=Greatest(F('ref_count') + delta, 0))
+
+@receiver(post_save, sender=Lesson)
+def count_content_artifact_refs(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'content_artifact' not in update_fields:
+        return
+    # DirtyFieldsMixin still holds the pre-save values while post_save runs
+    dirty = instance.get_dirty_fields()
+    if 'content_artifact' in dirty:
+        _shift_artifact_refs(dirty['content_artifact'], -1)
+        _shift_artifact_refs(instance.content_artifact_id, 1)
+
+@receiver(post_delete, sender=Lesson)
+def release_content_artifact_ref(sender, instance, **kwargs):
+    _shift_artifact_refs(instance.content_artifact_id, -1)
+
+@receiver([post_save, post_delete], sender=Lesson)
+def invalidate_lesson_caches(sender, instance, **kwargs):
+    forget_lesson_video_url(instance.pk)
+    forget_lesson_tutor_contexts([instance.pk])
+
+# pre_delete: the M2M rows leading to the courses are gone by post_delete
+@receiver([post_save, pre_delete], sender=Question)
+def invalidate_course_cache_on_question_change(sender, instance, **kwargs):
+    bump_course_versions(Quiz.objects.filter(questions=instance).values_list('course_id', flat=True))
+
+@receiver([post_save, pre_delete], sender=Category)
+def invalidate_course_cache_on_category_change(sender, instance, **kwargs):
+    bump_course_versions(Course.objects.filter(categories=instance).values_list('id', flat=True))
+
+@receiver(m2m_changed, sender=Course.categories.through)
+@receiver(m2m_changed, sender=Course.instructors.through)
+@receiver(m2m_changed, sender=Quiz.questions.through)
+def invalidate_course_cache_on_m2m_change(sender, instance, action, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if isinstance(instance, Course):
+        course_ids = [instance.pk]
+    elif isinstance(instance, Quiz):
+        course_ids = [instance.course_id]
+    elif isinstance(instance, Question):
+        quizzes = Quiz.objects.filter(pk__in=pk_set) if pk_set else instance.quizzes.all()
+        course_ids = quizzes.values_list('course_id', flat=True)
+    else:
+        # Reverse side from a Category or instructor: the changed rows are courses
+        course_ids = pk_set if pk_set else instance.courses.values_list('id', flat=True)
+    bump_course_versions(course_ids)
+
+@receiver([post_save, post_delete], sender=LessonProgress)
+@receiver([post_save, post_delete], sender=Submission)
+@receiver([post_save, post_delete], sender=Enrollment)
+def invalidate_user_state(sender, instance, **kwargs):
+    bump_user_state(instance.student_id)
@@ -1,36 +1,140 @@
 # courses/tasks.py
 import os
-import subprocess
 import tempfile
 import shutil
+import uuid
+from contextlib import contextmanager
 
-from celery import shared_task
-from django.core.files.base import ContentFile
+from celery import chain, group, shared_task
+from celery.exceptions import Ignore
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.db import transaction
 from google import genai
 from utils.drive_service import upload_video_private
+from utils.libreoffice import convert_to_pdf, ConversionError, PoolBusy
+from utils.tenant_limits import requeue, tenant_slot
 from django.apps import apps
 import time
 
+# Bytes held in memory at a time while copying documents out of storage
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def copy_to_temp_file(field_file, suffix):
+    """
+    Copies a stored file into a named temp file through a bounded buffer, so
+    worker memory does not grow with the file size. Returns the temp path.
+    """
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        with field_file.open("rb") as source:
+            shutil.copyfileobj(source, temp_file, COPY_BUFFER_SIZE)
+    return temp_file.name
+
+
+def save_from_path(field_file, name, path):
+    """Stores the file at ``path`` in ``field_file``; storage streams it in chunks."""
+    with open(path, "rb") as source:
+        field_file.save(name, File(source), save=False)
+
+
+def _is_stale(lesson_id, field, generation):
+    """True if a newer upload bumped ``field`` since this run was started."""
+    if generation is None:  # queued before generations were tracked
+        return False
+    Lesson = apps.get_model('courses', 'Lesson')
+    return not Lesson.objects.filter(id=lesson_id, **{field: generation}).exists()
+
+
+def _save_if_current(lesson, field, generation, update_fields):
+    """
+    Saves ``update_fields`` only while ``field`` still holds this run's
+    generation. The row lock makes the check and the write atomic with respect
+    to Lesson.bump_generation(). Returns whether it saved.
+    """
+    if generation is None:
+        lesson.save(update_fields=update_fields)
+        return True
+    with transaction.atomic():
+        current = type(lesson).objects.select_for_update().filter(
+            id=lesson.id, **{field: generation}
+        ).exists()
+        if current:
+            lesson.save(update_fields=update_fields)
+    if not current:
+        print(f"Discarding stale result for Lesson {lesson.id} ({field} {generation})")
+    return current
+
+
+@contextmanager
+def single_flight(key, timeout):
+    """
+    Yields True to the one run holding ``key`` and False to any other run that
+    starts while it is held (double enqueue, broker redelivery).
+    """
+    token = uuid.uuid4().hex
+    acquired = cache.add(key, token, timeout=timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired and cache.get(key) == token:
+            cache.delete(key)
+
+
 @shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=30, retry_kwargs={"max_retries": 3})
-def convert_lesson_to_pdf(self, lesson_id):
+def convert_lesson_to_pdf(self, lesson_id, generation=None):
     """
     Converts Lesson.content_file to PDF and saves it to pdf_version.
+    ``generation`` is the Lesson.content_generation of the upload to convert.
     """
     # Safe import inside the function to avoid circular error
     from .models import Lesson
 
     try:
-        lesson = Lesson.objects.get(id=lesson_id)
+        lesson = Lesson.objects.select_related("content_artifact", "course").get(id=lesson_id)
     except Lesson.DoesNotExist:
         return "Lesson not found"
 
+    if _is_stale(lesson_id, "content_generation", generation):
+        # A newer upload replaced the file; its own chain takes over
+        print(f"Skipping stale PDF conversion for Lesson {lesson_id}")
+        raise Ignore()
+
     if not lesson.content_file:
         lesson.processing_status = "skipped"
         return "No file to convert"
 
+    # An identical file may have been converted since this task was queued
+    artifact = lesson.content_artifact
+    if artifact and artifact.pdf_version:
+        lesson.pdf_version = artifact.pdf_version.name
+        lesson.processing_status = "completed"
+        _save_if_current(lesson, "content_generation", generation, ["pdf_version", "processing_status"])
+        return f"Success: reused PDF of artifact {artifact.sha256} for Lesson {lesson_id}"
+
+    # One conversion per file at a time: a duplicate run, or another lesson
+    # with the same file, comes back later and takes the reuse path above
+    key = f"courses:convert:{artifact.sha256}" if artifact else f"courses:convert:lesson-{lesson_id}"
+    with single_flight(key, settings.TENANT_SLOT_LEASE["documents"]) as acquired:
+        if not acquired:
+            requeue(self, settings.TENANT_BUSY_RETRY_COUNTDOWN)
+        with tenant_slot(self, "documents", lesson.course.tenant_id):
+            try:
+                return _convert_lesson(lesson, artifact, generation)
+            except PoolBusy:
+                # Every LibreOffice instance of this worker stayed busy: a load
+                # problem, not a bad document, so try again later
+                requeue(self, settings.TENANT_BUSY_RETRY_COUNTDOWN)
+
+
+def _convert_lesson(lesson, artifact, generation):
+    lesson_id = lesson.id
+
     # Mark as processing
     lesson.processing_status = "processing"
-    lesson.save(update_fields=["processing_status"])
+    if not _save_if_current(lesson, "content_generation", generation, ["processing_status"]):
+        return "Stale: a newer upload replaced this file"
 
     file_name, ext = os.path.splitext(lesson.content_file.name)
     ext = ext.lower()
@@ -38,69 +142,44 @@ def convert_lesson_to_pdf(self, lesson_id):
     allowed_extensions = [".ppt", ".pptx", ".doc", ".docx", ".xls", ".xlsx"]
     if ext not in allowed_extensions:
         lesson.processing_status = "skipped"
-        lesson.save(update_fields=["processing_status"])
+        _save_if_current(lesson, "content_generation", generation, ["processing_status"])
         return f"Unsupported file type: {ext}"
 
     # 1. Create temp input file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as temp_input:
-        lesson.content_file.open("rb")
-        temp_input.write(lesson.content_file.read())
-        lesson.content_file.close()
-        temp_input_path = temp_input.name
+    temp_input_path = copy_to_temp_file(lesson.content_file, ext)
 
     # 2. Temp output directory
     temp_output_dir = tempfile.mkdtemp()
 
     try:
-        # 3. Run LibreOffice
-        libreoffice_path = r"C:\Program Files\LibreOffice\program\soffice.exe"
-
-        command = [
-            libreoffice_path,
-            '--headless',
-            '--convert-to', 'pdf',
-            '--outdir', temp_output_dir,
-            temp_input_path
-        ]
-        subprocess.run(
-            command,
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
+        # 3. Convert on a warm LibreOffice instance (see utils/libreoffice.py)
+        pdf_path = convert_to_pdf(temp_input_path, temp_output_dir)
 
-        # 4. Find generated PDF (more reliable)
-        pdf_files = [
-            f for f in os.listdir(temp_output_dir) if f.lower().endswith(".pdf")
-        ]
-
-        if not pdf_files:
-            raise RuntimeError("PDF not generated by LibreOffice")
-
-        pdf_path = os.path.join(temp_output_dir, pdf_files[0])
-
-        # 5. Save PDF
-        with open(pdf_path, "rb") as pdf_file:
-            pdf_name = f"{os.path.basename(file_name)}.pdf"
-            lesson.pdf_version.save(
-                pdf_name,
-                ContentFile(pdf_file.read()),
-                save=False,
-            )
+        # 5. Save PDF (on the shared artifact, so identical uploads reuse it)
+        if artifact:
+            save_from_path(artifact.pdf_version, f"{artifact.sha256}.pdf", pdf_path)
+            artifact.save(update_fields=["pdf_version"])
+            lesson.pdf_version = artifact.pdf_version.name
+        else:
+            save_from_path(lesson.pdf_version, f"{os.path.basename(file_name)}.pdf", pdf_path)
 
         lesson.processing_status = "completed"
-        lesson.save(update_fields=["pdf_version", "processing_status"])
+        if not _save_if_current(lesson, "content_generation", generation, ["pdf_version", "processing_status"]):
+            return "Stale: a newer upload replaced this file"
 
         return f"Success: PDF generated for Lesson {lesson_id}"
 
-    except subprocess.CalledProcessError as e:
+    except PoolBusy:
+        raise
+
+    except ConversionError as e:
         lesson.processing_status = "failed"
-        lesson.save(update_fields=["processing_status"])
-        return f"LibreOffice failed: {e.stderr.decode(errors='ignore')}"
+        _save_if_current(lesson, "content_generation", generation, ["processing_status"])
+        return f"LibreOffice failed: {e}"
 
     except Exception as e:
         lesson.processing_status = "failed"
-        lesson.save(update_fields=["processing_status"])
+        _save_if_current(lesson, "content_generation", generation, ["processing_status"])
         raise e
 
     finally:
@@ -110,33 +189,256 @@ def convert_lesson_to_pdf(self, lesson_id):
             shutil.rmtree(temp_output_dir)
 
 @shared_task
-def process_lesson_ai_summary(previous_result, lesson_id):
-    from .models import Lesson # Avoid circular import
+def process_lesson_ai_summary(previous_result, lesson_id, generation=None):
     print(previous_result)
-    lesson = Lesson.objects.get(id=lesson_id)
-    pdf_path = lesson.pdf_file.path
+    if _is_stale(lesson_id, "content_generation", generation):
+        return f"Skipping stale summary for Lesson {lesson_id}"
+    with single_flight(f"courses:summary:{lesson_id}:{generation}", settings.TENANT_SLOT_LEASE["documents"]) as acquired:
+        if not acquired:
+            return f"Summary of Lesson {lesson_id} already in progress"
+        return _summarize_lesson(lesson_id, generation)
+
+
+def _summarize_lesson(lesson_id, generation):
+    from .models import Lesson # Avoid circular import
+    lesson = Lesson.objects.select_related("content_artifact").get(id=lesson_id)
+
+    # Reuse the summary of an identical, already summarized upload
+    artifact = lesson.content_artifact
+    if artifact and artifact.ai_summary:
+        lesson.ai_summary = artifact.ai_summary
+        _save_if_current(lesson, "content_generation", generation, ["ai_summary"])
+        return f"Reused summary of artifact {artifact.sha256}"
+
+    if not lesson.pdf_version:
+        return "No PDF to summarize"
+    pdf_path = lesson.pdf_version.path
     
     # 1. Initialize Gemini
     client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
     
-    # 2. Upload PDF to Gemini (or extract text manually)
-    # For simplicity, we'll extract text or send the file directly
-    with open(pdf_path, 'rb') as doc:
-        response = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=[
-                "Summarize this lesson content in 5 key bullet points for a student knowledge base.",
-                doc
-            ]
-        )
+    # 2. Upload PDF to Gemini
+    document = client.files.upload(file=pdf_path)
+    response = client.models.generate_content(
+        model="gemini-1.5-flash",
+        contents=[
+            "Summarize this lesson content in 5 key bullet points for a student knowledge base.",
+            document
+        ]
+    )
     
-    # 3. Save the summary back to the Lesson model
+    # 3. Save the summary back to the Lesson model (and its shared artifact)
     lesson.ai_summary = response.text
-    lesson.save()
+    _save_if_current(lesson, "content_generation", generation, ["ai_summary"])
+    if artifact:
+        artifact.ai_summary = response.text
+        artifact.save(update_fields=["ai_summary"])
+        _share_artifact_summary(artifact)
+
+
+def _share_artifact_summary(artifact):
+    """
+    Copies the artifact's summary to the other lessons using the same file
+    that are still without one (they reused its PDF before the summary was done).
+    """
+    from .cache import forget_lesson_tutor_contexts
+    from .models import Lesson
+
+    waiting = Lesson.objects.filter(content_artifact=artifact, ai_summary="")
+    lesson_ids = list(waiting.values_list("id", flat=True))
+    if lesson_ids:
+        # Bulk UPDATE skips signals: drop the tutor contexts holding the empty summary
+        Lesson.objects.filter(id__in=lesson_ids, ai_summary="").update(ai_summary=artifact.ai_summary)
+        forget_lesson_tutor_contexts(lesson_ids)
+
+
+VIDEO_ANALYSIS_PROMPT = (
+    "Analyze this educational video. Provide a detailed summary, "
+    "extract key conceptual definitions, list code implementations or diagrams shown, "
+    "and provide helpful student study notes."
+)
+
+
+def process_lesson_video(lesson_id, generation=None):
+    """
+    Starts the video pipeline of a lesson whose upload sits in video_file_temp.
+
+    The Gemini analysis and the Drive upload are independent, so they run as
+    two parallel branches: the video becomes playable (video_status) without
+    waiting for the summary (video_ai_status). Every analysis stage is its own
+    task, so no worker waits on Gemini: the state check re-schedules itself
+    with a countdown while Gemini processes the frames. Whichever branch ends
+    last deletes the temp file (see _release_video_temp_file).
+
+    ``generation`` is the Lesson.video_generation of this upload: stages of a
+    replaced upload stop at their next step and never write their results.
+    """
+    return group(
+        chain(
+            upload_lesson_video_to_gemini.si(lesson_id, generation),
+            wait_for_gemini_video.s(lesson_id, generation),
+            summarize_lesson_video.s(lesson_id, generation),
+        ),
+        upload_lesson_video_to_drive.si(lesson_id, generation),
+    ).apply_async()
+
+
+def _gemini_client():
+    return genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+
+
+def _release_video_temp_file(lesson_id):
+    """
+    Deletes the uploaded video once the Drive upload has succeeded and the
+    analysis has ended either way. Both branches call this as they finish;
+    the conditional UPDATE lets exactly one of them claim the file.
+    A failed Drive upload keeps the file.
+    """
+    Lesson = apps.get_model('courses', 'Lesson')
+    name = Lesson.objects.filter(id=lesson_id).values_list('video_file_temp', flat=True).first()
+    if not name:
+        return
+    released = Lesson.objects.filter(
+        id=lesson_id,
+        video_file_temp=name,
+        video_status='completed',
+        video_ai_status__in=['completed', 'failed'],
+    ).update(video_file_temp=None)
+    if released:
+        Lesson.video_file_temp.field.storage.delete(name)
+
+
+def _finish_video_analysis(lesson_id, generation, text, status='failed'):
+    Lesson = apps.get_model('courses', 'Lesson')
+    try:
+        lesson = Lesson.objects.get(id=lesson_id)
+    except Lesson.DoesNotExist:
+        return
+    lesson.ai_summary = text
+    lesson.video_ai_status = status
+    if _save_if_current(lesson, 'video_generation', generation, ['ai_summary', 'video_ai_status']):
+        _release_video_temp_file(lesson_id)
+
+
+def _delete_gemini_file(client, file_name):
+    try:
+        client.files.delete(name=file_name)
+    except Exception as e:
+        print(f"Could not delete Gemini file {file_name}: {e}")
+
+
+@shared_task(bind=True)
+def upload_lesson_video_to_gemini(self, lesson_id, generation=None):
+    """Analysis stage 1: hands the local video to the Gemini File API. Returns the file name."""
+    Lesson = apps.get_model('courses', 'Lesson')
+    try:
+        lesson = Lesson.objects.select_related('course').get(id=lesson_id)
+    except Lesson.DoesNotExist:
+        return None
+    if _is_stale(lesson_id, 'video_generation', generation):
+        return None
+    if not lesson.video_file_temp or not os.path.exists(lesson.video_file_temp.path):
+        return None
+
+    lock = single_flight(f"courses:video-ai:{lesson_id}:{generation}", settings.TENANT_SLOT_LEASE['media'])
+    with lock as acquired:
+        if not acquired:
+            return None  # a duplicate run; the first one carries on its own chain
+        with tenant_slot(self, 'media', lesson.course.tenant_id):
+            lesson.video_ai_status = 'processing'
+            if not _save_if_current(lesson, 'video_generation', generation, ['video_ai_status']):
+                return None
+
+            print(f"Starting Gemini AI Video Analysis for Lesson {lesson_id}...")
+            try:
+                gemini_file = _gemini_client().files.upload(file=lesson.video_file_temp.path)
+            except Exception as ai_err:
+                print(f"⚠️ AI Processing error (Skipping but continuing upload): {ai_err}")
+                _finish_video_analysis(lesson_id, generation, f"AI Analysis failed: {ai_err}")
+                return None
+            return gemini_file.name
+
+
+@shared_task(bind=True)
+def wait_for_gemini_video(self, file_name, lesson_id, generation=None):
+    """
+    Analysis stage 2: checks whether Gemini has finished processing the video frames.
+    While it has not, the task re-schedules itself VIDEO_AI_POLL_INTERVAL
+    seconds out (for up to VIDEO_AI_POLL_TIMEOUT) instead of sleeping.
+    """
+    if file_name is None:
+        return None
+    client = _gemini_client()
+    if _is_stale(lesson_id, 'video_generation', generation):
+        _delete_gemini_file(client, file_name)
+        return None
+    try:
+        gemini_file = client.files.get(name=file_name)
+    except Exception as ai_err:
+        print(f"⚠️ AI Processing error (Skipping but continuing upload): {ai_err}")
+        _finish_video_analysis(lesson_id, generation, f"AI Analysis failed: {ai_err}")
+        return None
+
+    if gemini_file.state.name == "PROCESSING":
+        max_polls = settings.VIDEO_AI_POLL_TIMEOUT // settings.VIDEO_AI_POLL_INTERVAL
+        if self.request.retries < max_polls:
+            raise self.retry(countdown=settings.VIDEO_AI_POLL_INTERVAL, max_retries=None)
+        print("Gemini video processing timed out, skipping AI summary.")
+        _finish_video_analysis(lesson_id, generation, "AI processing timed out for this video.")
+        _delete_gemini_file(client, file_name)
+        return None
+
+    if gemini_file.state.name == "FAILED":
+        print("Gemini video processing failed, skipping AI summary.")
+        _finish_video_analysis(lesson_id, generation, "AI processing failed for this video.")
+        _delete_gemini_file(client, file_name)
+        return None
+    return file_name
 
 
 @shared_task
-def upload_lesson_video_to_drive(lesson_id):
+def summarize_lesson_video(file_name, lesson_id, generation=None):
+    """Analysis stage 3: asks Gemini to watch the processed video and stores the summary."""
+    if file_name is None:
+        return None
+    client = _gemini_client()
+    try:
+        if _is_stale(lesson_id, 'video_generation', generation):
+            return None
+        response = client.models.generate_content(
+            model="gemini-2.0-flash",
+            contents=[client.files.get(name=file_name), VIDEO_ANALYSIS_PROMPT],
+        )
+        _finish_video_analysis(lesson_id, generation, response.text, status="completed")
+        print("✅ AI Analysis complete and saved to lesson.")
+    except Exception as ai_err:
+        print(f"⚠️ AI Processing error (Skipping but continuing upload): {ai_err}")
+        _finish_video_analysis(lesson_id, generation, f"AI Analysis failed: {ai_err}")
+    finally:
+        # Cleanup from Gemini Cloud storage
+        _delete_gemini_file(client, file_name)
+
+
+@shared_task(bind=True)
+def upload_lesson_video_to_drive(self, lesson_id, generation=None):
+    """Uploads the video to Drive (runs alongside the analysis stages)."""
+    Lesson = apps.get_model('courses', 'Lesson')
+    try:
+        tenant_id = Lesson.objects.values_list('course__tenant_id', flat=True).get(id=lesson_id)
+    except Lesson.DoesNotExist:
+        return "Lesson not found"
+    if _is_stale(lesson_id, 'video_generation', generation):
+        return f"Skipping stale video upload for Lesson {lesson_id}"
+
+    lock = single_flight(f"courses:video-drive:{lesson_id}:{generation}", settings.TENANT_SLOT_LEASE['media'])
+    with lock as acquired:
+        if not acquired:
+            return f"Video upload of Lesson {lesson_id} already in progress"
+        with tenant_slot(self, 'media', tenant_id):
+            return _upload_lesson_video(lesson_id, generation)
+
+
+def _upload_lesson_video(lesson_id, generation):
     Lesson = apps.get_model('courses', 'Lesson')
     try:
         lesson = Lesson.objects.get(id=lesson_id)
@@ -147,53 +449,11 @@ def upload_lesson_video_to_drive(lesson_id):
 
         # Update status to Processing
         lesson.video_status = 'processing'
-        lesson.save(update_fields=['video_status'])
+        if not _save_if_current(lesson, 'video_generation', generation, ['video_status']):
+            return "Stale: a newer video was uploaded"
 
         file_path = lesson.video_file_temp.path
 
-        # -------------------------------------------------------------
-        # STEP 1: AI Video Analysis (Must happen while local file exists)
-        # -------------------------------------------------------------
-        print(f"Starting Gemini AI Video Analysis for Lesson {lesson_id}...")
-        try:
-            client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-            
-            # Upload to Gemini File API
-            gemini_file = client.files.upload(file=file_path)
-            
-            # Wait for Gemini processing (videos take time to parse frames)
-            while gemini_file.state.name == "PROCESSING":
-                print("Waiting for Gemini to process video frames...")
-                time.sleep(10)
-                gemini_file = client.files.get(name=gemini_file.name)
-                
-            if gemini_file.state.name == "FAILED":
-                print("Gemini video processing failed, skipping AI summary.")
-                lesson.ai_summary = "AI processing failed for this video."
-            else:
-                # Ask Gemini to watch the video and write the summary
-                response = client.models.generate_content(
-                    model="gemini-2.0-flash",
-                    contents=[
-                        gemini_file,
-                        "Analyze this educational video. Provide a detailed summary, "
-                        "extract key conceptual definitions, list code implementations or diagrams shown, "
-                        "and provide helpful student study notes."
-                    ]
-                )
-                lesson.ai_summary = response.text
-                
-                # Cleanup from Gemini Cloud storage
-                client.files.delete(name=gemini_file.name)
-                print("✅ AI Analysis complete and saved to lesson.")
-                
-        except Exception as ai_err:
-            print(f"⚠️ AI Processing error (Skipping but continuing upload): {ai_err}")
-            lesson.ai_summary = f"AI Analysis failed: {ai_err}"
-
-        # -------------------------------------------------------------
-        # STEP 2: Your Original Google Drive Upload Logic
-        # -------------------------------------------------------------
         print(f"Uploading video to Google Drive for Lesson {lesson_id}...")
         
         # Call your existing custom uploader function
@@ -201,25 +461,85 @@ def upload_lesson_video_to_drive(lesson_id):
 
         drive_fake_url = f"https://drive.google.com/file/d/{file_id}/preview"
 
-        # Update Lesson with both Drive URL and AI Data
+        # Update Lesson with the Drive URL
         lesson.video_url = drive_fake_url
         lesson.video_status = 'completed'
         
-        # Cleanup (Delete the temp file from disk and DB field)
-        lesson.video_file_temp.storage.delete(lesson.video_file_temp.name)
-        lesson.video_file_temp = None 
-        
-        # Save all updated metrics safely
-        lesson.save(update_fields=['video_url', 'video_status', 'video_file_temp', 'ai_summary'])
+        # Save all updated metrics safely (ai_summary belongs to the AI stages)
+        if not _save_if_current(lesson, 'video_generation', generation, ['video_url', 'video_status']):
+            return f"Stale: discarded Drive upload {file_id}, a newer video was uploaded"
+
+        # Cleanup (the temp file goes once the analysis is done with it too)
+        _release_video_temp_file(lesson_id)
         
-        return f"Upload & AI Analysis Successful. Drive ID: {file_id}"
+        return f"Upload Successful. Drive ID: {file_id}"
 
     except Exception as e:
         print(f"Video Task Failed: {e}")
         try:
             lesson = Lesson.objects.get(id=lesson_id)
             lesson.video_status = 'failed'
-            lesson.save(update_fields=['video_status'])
+            _save_if_current(lesson, 'video_generation', generation, ['video_status'])
         except:
             pass
-        return f"Failed: {e}"
\ No newline at end of file
+        return f"Failed: {e}"
+
+
+def _video_poll_key(file_id):
+    return f"courses:video-poll:{file_id}"
+
+
+@shared_task
+def poll_video_processing_status():
+    """
+    Periodic (celery beat) check of every lesson whose Drive video is still
+    processing. Statuses are fetched in Drive batch requests and finished
+    lessons are flipped to is_processed in one UPDATE. A video that is still
+    processing is re-checked with exponential backoff (tracked in the cache
+    per Drive file, so a re-upload starts from the shortest delay).
+    """
+    from utils.drive_service import check_video_processing_statuses, drive_file_id_from_url
+    from .cache import bump_course_versions
+
+    Lesson = apps.get_model('courses', 'Lesson')
+    base_delay, max_delay = settings.VIDEO_STATUS_POLL_BACKOFF
+    now = time.time()
+
+    pending = {}
+    for lesson_id, course_id, video_url in Lesson.objects.filter(
+        is_processed=False, video_url__isnull=False
+    ).exclude(video_url='').values_list('id', 'course_id', 'video_url'):
+        file_id = drive_file_id_from_url(video_url)
+        if file_id:
+            pending.setdefault(file_id, []).append((lesson_id, course_id))
+
+    backoff = cache.get_many([_video_poll_key(file_id) for file_id in pending])
+    due = [
+        file_id for file_id in pending
+        if backoff.get(_video_poll_key(file_id), {}).get('next_check', 0) <= now
+    ]
+    if not due:
+        return "No videos due for a status check"
+
+    statuses = check_video_processing_statuses(due)
+    ready = [file_id for file_id in due if statuses.get(file_id) == 'READY']
+
+    if ready:
+        lessons = [lesson for file_id in ready for lesson in pending[file_id]]
+        Lesson.objects.filter(id__in=[lesson_id for lesson_id, _ in lessons]).update(is_processed=True)
+        # Bulk UPDATEs skip signals
+        bump_course_versions({course_id for _, course_id in lessons})
+        cache.delete_many([_video_poll_key(file_id) for file_id in ready])
+
+    retry = {}
+    for file_id in due:
+        if file_id in ready:
+            continue
+        attempts = backoff.get(_video_poll_key(file_id), {}).get('attempts', 0) + 1
+        delay = min(base_delay * 2 ** (attempts - 1), max_delay)
+        retry[_video_poll_key(file_id)] = {'attempts': attempts, 'next_check': now + delay}
+    if retry:
+        cache.set_many(retry, timeout=max_delay * 4)
+
+    return f"Checked {len(due)} videos, {len(ready)} ready"
+
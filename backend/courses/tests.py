@@ -1,3 +1,501 @@
-from django.test import TestCase
+import os
+import re
+import shutil
+import tempfile
+import threading
+import tracemalloc
+from io import StringIO
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+import requests
+from celery.exceptions import Ignore
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.db import transaction
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+
+from accounts.models import User
+from courses.async_views import _resolve_stream
+from courses.auth import StreamGrant, sign_stream_params, verify_stream_params
+from courses.cache import _serialize_structures, get_serialized_courses
+from courses.models import AIConversation, ContentArtifact, Course, Lesson
+from courses.serializers import LessonSerializer
+from courses.tasks import _summarize_lesson, convert_lesson_to_pdf
+from django.core.files.uploadedfile import SimpleUploadedFile
+from courses.tasks import COPY_BUFFER_SIZE, copy_to_temp_file, save_from_path
+from utils.libreoffice import OfficePool, PoolBusy
+from utils.tenant_limits import acquire_slot, release_slot, tenant_slot
+from utils.video_cache import HttpRangeFetcher, RangeNotSatisfiable, VideoChunkCache, shared_stats
+
+
+class FakeDriveHandler(BaseHTTPRequestHandler):
+    """Serves /files/<id>?alt=media with Range support, like the Drive API."""
+    files = {}
+    requests_seen = []
+
+    def do_GET(self):
+        match = re.match(r'^/files/([\w-]+)\?alt=media$', self.path)
+        data = self.files.get(match.group(1)) if match else None
+        if data is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        range_header = self.headers.get('Range')
+        self.requests_seen.append(range_header)
+        start, end = 0, len(data) - 1
+        if range_header:
+            first, last = re.match(r'bytes=(\d+)-(\d+)', range_header).groups()
+            start, end = int(first), min(int(last), len(data) - 1)
+        body = data[start:end + 1]
+        self.send_response(206 if range_header else 200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', str(len(body)))
+        if range_header:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(data)}')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class VideoChunkCacheTests(SimpleTestCase):
+    CHUNK = 100
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeDriveHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+        cls.video = bytes(range(256)) * 4  # 1024 bytes -> 11 chunks
+        FakeDriveHandler.files = {'vid': cls.video}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        FakeDriveHandler.requests_seen = []
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache = self.make_cache(max_bytes=10_000)
+
+    def make_cache(self, max_bytes):
+        fetcher = HttpRangeFetcher(base_url=self.base_url, session=requests.Session())
+        return VideoChunkCache(self.directory, max_bytes, self.CHUNK, fetcher=fetcher)
+
+    def read(self, range_header=None, cache=None):
+        cached = (cache or self.cache).open_range('vid', range_header)
+        return cached, b''.join(cached)
+
+    def test_miss_then_hit(self):
+        cached, body = self.read('bytes=150-349')
+        self.assertEqual(body, self.video[150:350])
+        self.assertEqual(cached.status, 206)
+        self.assertEqual(cached.headers['Content-Range'], 'bytes 150-349/1024')
+        upstream = len(FakeDriveHandler.requests_seen)
+
+        _, body = self.read('bytes=150-349')
+        self.assertEqual(body, self.video[150:350])
+        self.assertEqual(len(FakeDriveHandler.requests_seen), upstream)
+        self.assertEqual(self.cache.stats['hits'], 3)
+        self.assertEqual(self.cache.stats['misses'], 2)
+
+    def test_partial_hit_fetches_only_missing_chunks(self):
+        self.read('bytes=200-299')  # caches chunk 2
+        FakeDriveHandler.requests_seen = []
+
+        _, body = self.read('bytes=0-499')
+        self.assertEqual(body, self.video[:500])
+        self.assertEqual(FakeDriveHandler.requests_seen, ['bytes=0-199', 'bytes=300-499'])
+
+    def test_full_file_and_open_ended_ranges(self):
+        cached, body = self.read()
+        self.assertEqual((cached.status, body), (200, self.video))
+        _, body = self.read('bytes=1000-')
+        self.assertEqual(body, self.video[1000:])
+        _, body = self.read('bytes=-24')
+        self.assertEqual(body, self.video[-24:])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'video-stats'}})
+    def test_stats_are_published_to_the_shared_totals(self):
+        from django.core.cache import cache
+        cache.clear()
+        workers = [self.make_cache(max_bytes=10_000) for _ in range(2)]
+        for worker in workers:
+            worker.stats_interval = 0  # publish on every update
+            self.read('bytes=0-99', worker)
+
+        totals = shared_stats()
+        self.assertEqual(totals['hits'], sum(w.stats['hits'] for w in workers))
+        self.assertEqual(totals['misses'], sum(w.stats['misses'] for w in workers))
+        self.assertEqual(totals['hit_bytes'] + totals['miss_bytes'], 200)
+
+        out = StringIO()
+        call_command('video_cache_stats', stdout=out)
+        self.assertIn('Hit ratio 50.0% of chunk reads', out.getvalue())
+
+    def test_unsatisfiable_range(self):
+        with self.assertRaises(RangeNotSatisfiable):
+            self.read('bytes=5000-5100')
+
+    def test_evicts_least_recently_used_chunks(self):
+        cache = self.make_cache(max_bytes=350)
+        self.read('bytes=0-99', cache)
+        self.read('bytes=500-599', cache)
+        self.read('bytes=0-99', cache)  # chunk 0 is now more recent than chunk 5
+        self.read('bytes=800-999', cache)
+
+        self.assertGreater(cache.stats['evicted_chunks'], 0)
+        FakeDriveHandler.requests_seen = []
+        self.read('bytes=0-99', cache)
+        self.assertEqual(FakeDriveHandler.requests_seen, [])
+
+
+class StreamingFileIOTests(SimpleTestCase):
+    """The document pipeline must copy files with memory independent of their size."""
+    FILE_SIZE = 64 * 1024 * 1024
+    # Read buffer + the bytes it returns, plus slack; far below FILE_SIZE
+    MEMORY_BOUND = 2 * COPY_BUFFER_SIZE + 512 * 1024
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        media_root = override_settings(MEDIA_ROOT=self.directory)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+        self.big_path = os.path.join(self.directory, 'deck.pptx')
+        with open(self.big_path, 'wb') as big:
+            block = os.urandom(1024 * 1024)
+            for _ in range(self.FILE_SIZE // len(block)):
+                big.write(block)
+
+    def assert_bounded(self, func):
+        tracemalloc.start()
+        try:
+            result = func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, self.MEMORY_BOUND)
+        return result
+
+    def test_copy_to_temp_file_is_bounded(self):
+        artifact = ContentArtifact(sha256='ab' * 32, content_file='deck.pptx')
+
+        temp_path = self.assert_bounded(lambda: copy_to_temp_file(artifact.content_file, '.pptx'))
+        self.addCleanup(os.remove, temp_path)
+        self.assertEqual(os.path.getsize(temp_path), self.FILE_SIZE)
+
+    def test_save_from_path_is_bounded(self):
+        artifact = ContentArtifact(sha256='ab' * 32)
+
+        self.assert_bounded(lambda: save_from_path(artifact.pdf_version, 'deck.pdf', self.big_path))
+        self.assertEqual(artifact.pdf_version.size, self.FILE_SIZE)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tenant-slots'}},
+    TENANT_TASK_CONCURRENCY={'media': 2},
+    TENANT_SLOT_LEASE={'media': 60},
+)
+class TenantSlotTests(SimpleTestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_cap_is_per_tenant(self):
+        leases = [acquire_slot('media', 1), acquire_slot('media', 1)]
+        self.assertTrue(all(leases))
+        self.assertIs(acquire_slot('media', 1), False)
+        self.assertTrue(acquire_slot('media', 2))
+
+        release_slot(leases[0])
+        self.assertTrue(acquire_slot('media', 1))
+
+    def test_uncapped_kind(self):
+        self.assertIsNone(acquire_slot('documents', 1))
+
+    def test_busy_tenant_requeues_task(self):
+        task = mock.Mock()
+        acquire_slot('media', 1)
+        acquire_slot('media', 1)
+
+        with self.assertRaises(Ignore):
+            with tenant_slot(task, 'media', 1):
+                self.fail("ran without a free slot")
+        task.signature_from_request.return_value.apply_async.assert_called_once()
+
+        with tenant_slot(task, 'media', 2):
+            pass
+        self.assertTrue(acquire_slot('media', 2))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'course-cache'}})
+class CourseCacheCommitTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.course = Course.objects.create(title='Old title', description='d')
+        request = Request(RequestFactory().get('/api/courses/'))
+        request.user = AnonymousUser()
+        self.context = {'request': request}
+
+    def cached_title(self):
+        return get_serialized_courses([self.course.id], self.context)[0]['title']
+
+    def test_reader_racing_an_open_transaction_cannot_cache_stale_data(self):
+        stale = _serialize_structures([self.course.id], self.context)
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                self.course.title = 'New title'
+                self.course.save()
+                # A concurrent request still sees the committed (old) row and caches it
+                with mock.patch('courses.cache._serialize_structures', return_value=stale):
+                    self.assertEqual(self.cached_title(), 'Old title')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.cached_title(), 'New title')
+
+    def test_rolled_back_change_does_not_invalidate(self):
+        self.cached_title()
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                self.course.title = 'New title'
+                self.course.save()
+                transaction.set_rollback(True)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.cached_title(), 'Old title')
+
+
+@override_settings(STREAM_URL_TTL=600)
+class SignedStreamUrlTests(TestCase):
+    LESSON = 5
+    USER = 42
+
+    def setUp(self):
+        patcher = mock.patch('courses.views.get_lesson_video_url', return_value='')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.params = sign_stream_params(self.USER, self.LESSON)
+
+    def stream(self, lesson_id, params):
+        # Past authentication the view answers 404: the patched lesson has no video
+        return APIClient().get(f'/api/lessons/{lesson_id}/stream/', params).status_code
+
+    def test_valid_signature(self):
+        grant = verify_stream_params(self.params, self.LESSON)
+        self.assertIsInstance(grant, StreamGrant)
+        self.assertEqual((grant.id, grant.lesson_id), (self.USER, self.LESSON))
+        self.assertEqual(self.stream(self.LESSON, self.params), 404)
+
+    def test_tampered_ids_are_rejected(self):
+        for name in ('uid', 'lesson'):
+            tampered = {**self.params, name: self.params[name] + 1}
+            with self.subTest(param=name):
+                with self.assertRaises(AuthenticationFailed):
+                    verify_stream_params(tampered, tampered['lesson'])
+                self.assertEqual(self.stream(tampered['lesson'], tampered), 401)
+
+    def test_expired_url_is_rejected(self):
+        with mock.patch('courses.auth.time.time', return_value=self.params['exp'] + 1):
+            with self.assertRaises(AuthenticationFailed):
+                verify_stream_params(self.params, self.LESSON)
+            self.assertEqual(self.stream(self.LESSON, self.params), 401)
+
+    def test_replay_against_another_lesson_is_rejected(self):
+        with self.assertRaises(AuthenticationFailed):
+            verify_stream_params(self.params, self.LESSON + 1)
+        self.assertEqual(self.stream(self.LESSON + 1, self.params), 401)
+
+    def test_async_view_applies_the_same_checks(self):
+        factory = RequestFactory()
+        with mock.patch('courses.async_views.get_lesson_video_url', return_value=''):
+            valid = _resolve_stream(factory.get('/', self.params), self.LESSON)
+            replayed = _resolve_stream(factory.get('/', self.params), self.LESSON + 1)
+        self.assertEqual(valid.status_code, 404)
+        self.assertEqual(replayed.status_code, 401)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'office-pool'}},
+    LIBREOFFICE_CONVERT_TIMEOUT=0.01,
+)
+class OfficePoolBusyTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        media_root = override_settings(MEDIA_ROOT=self.directory)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def test_exhausted_pool_raises_pool_busy(self):
+        pool = OfficePool(size=1, max_conversions=10)
+        pool._started = 1  # the only instance is converting elsewhere
+        with self.assertRaises(PoolBusy):
+            pool.convert('deck.pptx', self.directory)
+
+    def test_busy_pool_requeues_instead_of_failing_the_lesson(self):
+        course = Course.objects.create(title='Course', description='d')
+        lesson = Lesson.objects.create(
+            course=course, title='Deck', content_file=SimpleUploadedFile('deck.pptx', b'slides')
+        )
+        busy = PoolBusy("No LibreOffice instance became free in time.")
+        with mock.patch('courses.tasks.convert_to_pdf', side_effect=busy), \
+                mock.patch('courses.tasks.requeue', side_effect=Ignore) as requeue:
+            with self.assertRaises(Ignore):
+                convert_lesson_to_pdf.run(lesson.id, lesson.content_generation)
+        requeue.assert_called_once()
+        lesson.refresh_from_db()
+        self.assertNotEqual(lesson.processing_status, 'failed')
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class LessonGenerationTests(TransactionTestCase):
+    BUMPS_PER_THREAD = 50
+
+    def test_concurrent_bumps_get_distinct_generations(self):
+        course = Course.objects.create(title='Course', description='d')
+        lesson = Lesson.objects.create(course=course, title='Deck')
+        start = threading.Barrier(2)
+        results = [[], []]
+
+        def bump(out):
+            try:
+                copy = Lesson.objects.get(pk=lesson.pk)
+                start.wait()
+                for _ in range(self.BUMPS_PER_THREAD):
+                    out.append(copy.bump_generation('content_generation'))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=bump, args=(out,)) for out in results]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        generations = results[0] + results[1]
+        self.assertEqual(len(generations), 2 * self.BUMPS_PER_THREAD)
+        self.assertEqual(len(set(generations)), len(generations))
+        lesson.refresh_from_db()
+        self.assertEqual(lesson.content_generation, max(generations))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'dedup'}})
+class SharedArtifactSummaryTests(TestCase):
+    """A lesson reusing a converted PDF whose summary is not done yet."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        media_root = override_settings(MEDIA_ROOT=self.directory)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+        self.course = Course.objects.create(title='Course', description='d')
+        self.first = self.upload('First', order=1)
+        # The first upload's conversion finished; its summary is still running
+        artifact = self.first.content_artifact
+        artifact.pdf_version.save('deck.pdf', SimpleUploadedFile('deck.pdf', b'%PDF'), save=True)
+        self.first.pdf_version = artifact.pdf_version.name
+        self.first.save(update_fields=['pdf_version'])
+
+    def upload(self, title, order):
+        return Lesson.objects.create(
+            course=self.course, title=title, order=order,
+            content_file=SimpleUploadedFile('deck.pptx', b'same slides'),
+        )
+
+    def test_reused_pdf_without_summary_queues_a_summary(self):
+        with mock.patch('courses.models.process_lesson_ai_summary') as summarize, \
+                self.captureOnCommitCallbacks(execute=True):
+            second = self.upload('Second', order=2)
+        self.assertEqual(second.processing_status, 'completed')
+        self.assertEqual(second.content_artifact_id, self.first.content_artifact_id)
+        summarize.s.assert_called_once_with("Reused PDF", second.id, second.content_generation)
+        summarize.s.return_value.apply_async.assert_called_once()
+
+    def test_finished_summary_reaches_lessons_sharing_the_file(self):
+        second = self.upload('Second', order=2)
+        self.assertEqual(second.ai_summary, '')
+
+        with mock.patch('courses.tasks.genai.Client') as client:
+            client.return_value.models.generate_content.return_value.text = 'Five key points'
+            _summarize_lesson(self.first.id, self.first.content_generation)
+
+        second.refresh_from_db()
+        self.assertEqual(second.ai_summary, 'Five key points')
+
+
+class ReplacedVideoUploadTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        media_root = override_settings(MEDIA_ROOT=self.directory)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def test_replacing_a_processing_video_deletes_the_old_upload(self):
+        course = Course.objects.create(title='Course', description='d')
+        lesson = Lesson.objects.create(
+            course=course, title='Video', video_status='processing',
+            video_file_temp=SimpleUploadedFile('first.mp4', b'first video'),
+        )
+        old_name = lesson.video_file_temp.name
+        storage = lesson.video_file_temp.storage
+
+        serializer = LessonSerializer(
+            lesson, data={'video_file_temp': SimpleUploadedFile('second.mp4', b'second video')},
+            partial=True, context={'course': course},
+        )
+        serializer.is_valid(raise_exception=True)
+        with mock.patch('courses.serializers.process_lesson_video') as process, \
+                self.captureOnCommitCallbacks(execute=True):
+            lesson = serializer.save()
+
+        process.assert_called_once_with(lesson.id, lesson.video_generation)
+        self.assertFalse(storage.exists(old_name))
+        self.assertTrue(storage.exists(lesson.video_file_temp.name))
+
+
+class LegacyTranscriptTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create(username='student', email='student@example.com', phone='1')
+        self.lesson = Lesson.objects.create(
+            course=Course.objects.create(title='Course', description='d'), title='Lesson',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_legacy_transcript_is_migrated_on_first_read(self):
+        conversation = AIConversation.objects.create(
+            student=self.student, lesson=self.lesson, session_id='legacy',
+            transcript=[{'role': 'user', 'text': 'Hi'}, {'role': 'ai', 'content': 'Hello'}],
+        )
+
+        listed = self.client.get('/api/ai-conversations/').json()['results'][0]
+        self.assertEqual(listed['message_count'], 2)
+        self.assertEqual(listed['last_message']['text'], 'Hello')
+
+        messages = self.client.get(f'/api/ai-conversations/{conversation.id}/messages/').json()['results']
+        self.assertEqual([(m['role'], m['text']) for m in messages], [('user', 'Hi'), ('ai', 'Hello')])
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.transcript, [])
+
+    def test_posted_transcript_is_rejected(self):
+        response = self.client.post('/api/ai-conversations/', {
+            'session_id': 'new', 'lesson': self.lesson.id, 'transcript': [{'role': 'user', 'text': 'Hi'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('transcript', response.json())
+        self.assertFalse(AIConversation.objects.exists())
@@ -1,9 +1,11 @@
 import json
 
 from rest_framework import viewsets, status,permissions
-from .models import Course, Lesson, Category,LessonProgress,AIConversation
-from .serializers import CourseSerializer, LessonSerializer, CategorySerializer,LessonProgressSerializer,AIConversationSerializer
+from .models import Course, Lesson, Category,LessonProgress,AIConversation,AIConversationMessage
+from .serializers import CourseSerializer, LessonSerializer, CategorySerializer,LessonProgressSerializer,AIConversationSerializer, AIConversationMessageSerializer, TranscriptAppendSerializer, course_tree_prefetches
+from accounts.mixins import SparseFieldsViewMixin
 from accounts.permissions import IsAdminOrInstructor
+from core.pagination import KeysetPagination
 from rest_framework_tracking.mixins import LoggingMixin
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -11,13 +13,19 @@ from django.shortcuts import get_object_or_404
 from accounts.models import User
 from enrollments.models import Enrollment
 from quizzes.models import Submission
-from django.db.models import Prefetch
-from utils.drive_service import check_video_processing_status
+from django.db import transaction
+from django.db.models import F, Prefetch
 from django.http import StreamingHttpResponse, HttpResponse, Http404
 from rest_framework.views import APIView
 from rest_framework import permissions
-from utils.drive_service import stream_video_from_drive
-from .auth import QueryStringJWTAuthentication
+from utils.drive_service import stream_video_from_drive, drive_file_id_from_url
+from utils.video_cache import get_video_cache, RangeNotSatisfiable, UpstreamError
+from django.conf import settings
+from .auth import QueryStringJWTAuthentication, SignedStreamAuthentication, sign_stream_params
+from .cache import get_serialized_courses, get_lesson_tutor_context, get_lesson_video_url, get_tenant_persona
+from django.urls import reverse
+from django.utils.http import urlencode
+from datetime import datetime, timezone as dt_timezone
 import re
 
 class CategoryViewSet(LoggingMixin, viewsets.ModelViewSet):
@@ -26,7 +34,7 @@ class CategoryViewSet(LoggingMixin, viewsets.ModelViewSet):
     permission_classes = [IsAdminOrInstructor]
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [IsAdminOrInstructor]
@@ -47,34 +55,39 @@ class CourseViewSet(viewsets.ModelViewSet):
             except ValueError:
                 pass 
 
-        # --- 2. New Optimization Logic ---
-        # Always prefetch the course structure (lessons and quizzes)
-        queryset = queryset.prefetch_related('lessons', 'quizzes')
-
-        # Only prefetch progress/submissions if the user is logged in
-        if user.is_authenticated:
-            queryset = queryset.prefetch_related(
-                # Optimize Lesson Progress
-                Prefetch(
-                    'lessons__progress',
-                    queryset=LessonProgress.objects.filter(student=user),
-                    to_attr='user_progress'
-                ),
-                # Optimize Quiz Submissions
-                Prefetch(
-                    'quizzes__submissions', 
-                    queryset=Submission.objects.filter(student=user),
-                    to_attr='user_submissions'
-                ),
-                Prefetch(
-                'enrollments',
-                queryset=Enrollment.objects.filter(student=user),
-                to_attr='current_user_enrollment'
-                )
-            )
+        # --- 2. Optimization Logic ---
+        # Prefetch the course structure; per-user progress/submissions are read
+        # from the request-wide UserCourseState in the serializer context
+        queryset = queryset.prefetch_related(*course_tree_prefetches(requested=self.field_requested))
 
         return queryset.distinct()
 
+    def list(self, request, *args, **kwargs):
+        # Serve the course tree from the structure/user-state cache (courses/cache.py);
+        # only the (paginated) id lookup touches the database on a warm cache.
+        # Sparse (?fields= / ?expand=) responses are built directly instead.
+        if self.sparse_fields is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self._course_ids_queryset()
+        page = self.paginate_queryset(queryset)
+        courses = page if page is not None else list(queryset)
+        data = get_serialized_courses([c.id for c in courses], self.get_serializer_context())
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        if self.sparse_fields is not None:
+            return super().retrieve(request, *args, **kwargs)
+        course = get_object_or_404(self._course_ids_queryset(), pk=kwargs[self.lookup_field])
+        self.check_object_permissions(request, course)
+        data = get_serialized_courses([course.id], self.get_serializer_context())
+        return Response(data[0])
+
+    def _course_ids_queryset(self):
+        # Same filtering as get_queryset(), minus the prefetches
+        return self.filter_queryset(self.get_queryset()).prefetch_related(None).only('id')
+
     def perform_create(self, serializer):
         course = serializer.save()
         if self.request.user.role == "instructor":
@@ -140,26 +153,6 @@ class LessonViewSet(viewsets.ModelViewSet):
             context['course'] = course
         return context
 
-    # --- NEW: Override Retrieve to handle Video Status ---
-    def retrieve(self, request, *args, **kwargs):
-        """
-        Custom retrieve to check Video Processing status on the fly.
-        """
-        instance = self.get_object()
-        if instance.video_url and not instance.is_processed:
-            try:
-                file_id = instance.video_url.split('/d/')[1].split('/')[0]
-                status_google = check_video_processing_status(file_id)
-                if status_google == 'READY':
-                    instance.is_processed = True
-                    instance.save(update_fields=['is_processed'])
-
-            except Exception as e:
-                print(f"Error auto-checking video status: {e}")
-
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
-
     @action(detail=True, methods=['get'])
     def check_access(self, request, pk=None, course_pk=None):
         lesson = self.get_object()
@@ -177,22 +170,59 @@ class LessonViewSet(viewsets.ModelViewSet):
              "reason": f"Locked. You must pass '{lesson.prerequisite_quiz.title}' with {lesson.prerequisite_score}% score."
         }, status=status.HTTP_403_FORBIDDEN)
 
+    @action(detail=True, methods=['get'])
+    def tutor_context(self, request, pk=None, course_pk=None):
+        """
+        Everything the AI tutor needs to open a session in one small payload:
+        lesson title and summary, course title and the caller's tenant persona.
+        Served from the cache without get_object(), so a hit costs no queries.
+        """
+        try:
+            context = get_lesson_tutor_context(int(pk))
+        except (ValueError, Lesson.DoesNotExist):
+            raise Http404
+        if course_pk is not None and str(context['course_id']) != str(course_pk):
+            raise Http404
+        return Response({**context, "persona": get_tenant_persona(request.user.tenant_id)})
+
+    @action(detail=True, methods=['get'])
+    def stream_url(self, request, pk=None, course_pk=None):
+        """
+        Issues a short-lived signed URL for the lesson video. The stream view
+        verifies it with an HMAC check, so seeking costs no auth queries.
+        """
+        lesson = self.get_object()
+        if not lesson.video_url:
+            return Response({"detail": "No video available for this lesson."}, status=status.HTTP_404_NOT_FOUND)
+        params = sign_stream_params(request.user.id, lesson.id)
+        url = reverse('lesson-video-stream', kwargs={'lesson_id': lesson.id})
+        return Response({
+            "url": request.build_absolute_uri(f"{url}?{urlencode(params)}"),
+            "expires_at": datetime.fromtimestamp(params['exp'], tz=dt_timezone.utc),
+        })
+
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'check_access']:
+        if self.action in ['list', 'retrieve', 'check_access', 'stream_url']:
             permission_classes = [permissions.IsAuthenticated]
         else:
             permission_classes = [IsAdminOrInstructor] # Ensure this permission class is imported
         return [permission() for permission in permission_classes]
         
-class LessonProgressViewSet(viewsets.ModelViewSet):
+class LessonProgressViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = LessonProgressSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    # completed_at is nullable, so page on the primary key alone
+    cursor_ordering = ('-id',)
 
     def get_queryset(self):
         """
         Ensure users only see their own progress.
         """
-        return LessonProgress.objects.filter(student=self.request.user)
+        queryset = LessonProgress.objects.filter(student=self.request.user)
+        if self.field_requested('lesson_title'):
+            queryset = queryset.select_related('lesson')
+        return queryset
 
     def perform_create(self, serializer):
         """
@@ -206,14 +236,18 @@ class LessonVideoStreamView(APIView):
     Proxies the video stream from Google Drive to the user.
     Hides the real Drive URL and enforces Django permissions.
     """
-    # Only logged-in users can hit this endpoint
-    authentication_classes = [QueryStringJWTAuthentication] 
+    # Only logged-in users can hit this endpoint. Signed URLs (see
+    # LessonViewSet.stream_url) are checked first and need no database access;
+    # ?token=<JWT> keeps working for older clients.
+    authentication_classes = [SignedStreamAuthentication, QueryStringJWTAuthentication] 
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, lesson_id):
-        # 1. Fetch Lesson Object
-        # We use get_object_or_404 for cleaner error handling
-        lesson = get_object_or_404(Lesson, id=lesson_id)
+        # 1. Fetch the lesson's video URL (cached, see courses/cache.py)
+        try:
+            video_url = get_lesson_video_url(lesson_id)
+        except Lesson.DoesNotExist:
+            raise Http404("Lesson not found.")
 
         # 2. (Optional) Custom Permission Check
         # Example: Check if student is enrolled in the course
@@ -221,25 +255,22 @@ class LessonVideoStreamView(APIView):
         #     return HttpResponse("Unauthorized: You do not own this course.", status=403)
 
         # 3. Check if video exists
-        if not lesson.video_url:
+        if not video_url:
             return HttpResponse("No video available for this lesson.", status=404)
 
         # 4. Extract the Google Drive File ID
         # You store the full URL (e.g., https://drive.google.com/file/d/123XYZ/preview)
         # We need to extract just "123XYZ"
-        match = re.search(r'/d/([a-zA-Z0-9_-]+)', lesson.video_url)
-        if match:
-            file_id = match.group(1)
-        else:
-            # Fallback: if you stored just the ID by mistake, use it directly
-            if 'http' not in lesson.video_url:
-                file_id = lesson.video_url
-            else:
-                return HttpResponse("Invalid Video URL format in database.", status=500)
+        file_id = drive_file_id_from_url(video_url)
+        if file_id is None:
+            return HttpResponse("Invalid Video URL format in database.", status=500)
 
         # 5. Handle "Range" Header (Crucial for video seeking/scrubbing)
         range_header = request.headers.get('Range', None)
 
+        if settings.VIDEO_CACHE_MAX_BYTES and re.fullmatch(r'[A-Za-z0-9_-]+', file_id):
+            return self.stream_from_cache(file_id, range_header)
+
         try:
             # 6. Get Stream from Drive
             google_response = stream_video_from_drive(file_id, range_header)
@@ -253,7 +284,7 @@ class LessonVideoStreamView(APIView):
 
             # 7. Stream it back to the user
             response = StreamingHttpResponse(
-                google_response.iter_content(chunk_size=8192), # 8KB chunks
+                google_response.iter_content(chunk_size=settings.VIDEO_STREAM_CHUNK_SIZE),
                 status=google_response.status_code,
                 content_type=google_response.headers.get('Content-Type', 'video/mp4')
             )
@@ -268,18 +299,63 @@ class LessonVideoStreamView(APIView):
         except Exception as e:
             print(f"Streaming Error: {e}")
             return HttpResponse("Internal Server Error while streaming.", status=500)
+
+    def stream_from_cache(self, file_id, range_header):
+        """Serves the range from the local chunk cache, fetching only missing chunks."""
+        try:
+            cached = get_video_cache().open_range(file_id, range_header)
+        except UpstreamError as e:
+            return HttpResponse(f"Upstream Error from Drive: {e.status}", status=e.status)
+        except RangeNotSatisfiable as e:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{e.total}'
+            return response
+        except Exception as e:
+            print(f"Streaming Error: {e}")
+            return HttpResponse("Internal Server Error while streaming.", status=500)
+
+        response = StreamingHttpResponse(cached, status=cached.status, content_type=cached.content_type)
+        for header, value in cached.headers.items():
+            response[header] = value
+        return response
         
 class AIConversationViewSet(viewsets.ModelViewSet):
     serializer_class = AIConversationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    @property
+    def cursor_ordering(self):
+        # Sessions newest first; a transcript in message order
+        return ('seq',) if self.action == 'messages' else ('-created_at', '-id')
 
     def get_queryset(self):
-        queryset = AIConversation.objects.filter(student=self.request.user)
+        if self.action in ('list', 'retrieve', 'messages'):
+            self.migrate_legacy_transcripts()
+        queryset = AIConversation.objects.filter(student=self.request.user).defer('transcript')
         lesson_id = self.request.query_params.get('lesson') 
         if lesson_id:
             queryset = queryset.filter(lesson_id=lesson_id)
+        if self.action in ('list', 'retrieve'):
+            # Only the latest message of each session, in one query per page
+            queryset = queryset.prefetch_related(Prefetch(
+                'messages',
+                queryset=AIConversationMessage.objects.filter(seq=F('conversation__message_count') - 1),
+                to_attr='last_messages',
+            ))
         return queryset.order_by('-created_at')
 
+    def migrate_legacy_transcripts(self):
+        # Sessions saved before transcripts moved to message rows stay invisible
+        # to the message API until migrate_ai_transcripts has run; move the
+        # student's own on first read instead of waiting for it
+        pending = AIConversation.objects.filter(student=self.request.user, message_count=0).exclude(transcript=[])
+        if not pending.exists():
+            return
+        with transaction.atomic():
+            for conversation in pending.select_for_update():
+                conversation.migrate_transcript()
+
     def create(self, request, *args, **kwargs):
         session_id = request.data.get("session_id")
         
@@ -311,4 +387,54 @@ class AIConversationViewSet(viewsets.ModelViewSet):
 
             return Response(serializer.data, status=status_code)
 
-        return super().create(request, *args, **kwargs)
\ No newline at end of file
+        return super().create(request, *args, **kwargs)
+
+    @action(detail=True, methods=['get'])
+    def messages(self, request, pk=None):
+        """The session's transcript, paginated in message order."""
+        conversation = self.get_object()
+        page = self.paginate_queryset(conversation.messages.all())
+        serializer = AIConversationMessageSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['post'], url_path='append')
+    def append_messages(self, request):
+        """
+        Appends new turns to a session's transcript, creating the session on
+        its first batch. The AI tutor sends only what it has not synced yet;
+        ``offset`` makes retries safe: messages already stored are skipped,
+        and a gap (offset past the stored length) is refused with 409 and the
+        stored length so the sender can resend from there.
+        """
+        serializer = TranscriptAppendSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        with transaction.atomic():
+            conversation, created = AIConversation.objects.select_for_update().get_or_create(
+                session_id=data['session_id'],
+                defaults={
+                    'student': request.user,
+                    'lesson': data['lesson'],
+                    'tenant': request.user.tenant if hasattr(request.user, 'tenant') else None,
+                },
+            )
+            if conversation.student_id != request.user.id:
+                raise Http404
+            conversation.migrate_transcript()
+
+            stored = conversation.message_count
+            if data['offset'] > stored:
+                return Response({"length": stored}, status=status.HTTP_409_CONFLICT)
+
+            new_messages = data['messages'][stored - data['offset']:]
+            if new_messages:
+                conversation.append_messages(new_messages)
+            if data.get('summary'):
+                conversation.summary = data['summary']
+                conversation.save(update_fields=['summary'])
+
+        return Response(
+            {"id": conversation.id, "length": conversation.message_count},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
\ No newline at end of file
@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from courses.cache import bump_course_versions
+from courses.models import Course, LessonProgress
+from enrollments.models import Enrollment
+from quizzes.models import Submission
+
+
+class Command(BaseCommand):
+    help = "Recounts the completed/total progress counters of enrollments and repairs any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--course", type=int, action="append", dest="courses",
+                            help="Only reconcile this course id (repeatable).")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report drifted enrollments without writing the fixes.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        courses = Course.objects.annotate(
+            lesson_count=Count("lessons", distinct=True),
+            quiz_count=Count("quizzes", distinct=True),
+        ).only("id")
+        if options["courses"]:
+            courses = courses.filter(id__in=options["courses"])
+
+        checked = repaired = 0
+        for course in courses.iterator():
+            total = course.lesson_count + course.quiz_count
+            completed = self._completed_by_student(course.id)
+
+            drifted = []
+            enrollments = Enrollment.objects.filter(course_id=course.id).only(
+                "id", "student_id", "course_id", "completed_items", "total_items", "progress"
+            )
+            for enrollment in enrollments.iterator(chunk_size=options["batch_size"]):
+                checked += 1
+                done = min(completed.get(enrollment.student_id, 0), total)
+                if enrollment.completed_items == done and enrollment.total_items == total:
+                    continue
+                self.stdout.write(
+                    f"Enrollment {enrollment.id} (course {course.id}): "
+                    f"{enrollment.completed_items}/{enrollment.total_items} -> {done}/{total}"
+                )
+                enrollment._set_counters(done, total)
+                drifted.append(enrollment)
+
+            repaired += len(drifted)
+            if drifted and not options["dry_run"]:
+                Enrollment.objects.bulk_update(
+                    drifted, ["completed_items", "total_items", "progress"],
+                    batch_size=options["batch_size"],
+                )
+                bump_course_versions([course.id])
+
+        verb = "Found" if options["dry_run"] else "Repaired"
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} enrollments. {verb} {repaired} with drifted counters."
+        ))
+
+    def _completed_by_student(self, course_id):
+        """Completed lessons + distinct submitted quizzes per student for one course."""
+        completed = {}
+        lessons = LessonProgress.objects.filter(
+            lesson__course_id=course_id, is_completed=True
+        ).values("student_id").annotate(n=Count("id"))
+        quizzes = Submission.objects.filter(
+            quiz__course_id=course_id
+        ).values("student_id").annotate(n=Count("quiz", distinct=True))
+        for row in list(lessons) + list(quizzes):
+            completed[row["student_id"]] = completed.get(row["student_id"], 0) + row["n"]
+        return completed
@@ -1,10 +1,77 @@
 from django.db import models
+from django.db.models import Case, DecimalField, F, FloatField, Func, OuterRef, Subquery, When
+from django.db.models.functions import Cast, Coalesce, Greatest, Round
+from django.db.models.lookups import GreaterThan
 from accounts.models import User,StudentGroup
-from courses.models import Course,LessonProgress
-from quizzes.models import Submission
+from courses.models import Course,Lesson,LessonProgress
+from quizzes.models import Quiz,Submission
 from django.core.validators import MinValueValidator, MaxValueValidator
+from core.mixins import DirtyFieldsMixin
 
-class Enrollment(models.Model):
+
+def progress_expression(completed, total):
+    """
+    SQL expression for the progress percentage of ``completed`` out of ``total``
+    items, rounded to two decimals (0 when the course has no items).
+    """
+    return Case(
+        When(GreaterThan(total, 0), then=Round(Cast(completed, FloatField()) * 100.0 / total, 2)),
+        default=0.0,
+        output_field=DecimalField(max_digits=5, decimal_places=2),
+    )
+
+
+def _count(queryset, field='pk', distinct=False):
+    """COUNT() of a correlated subquery, usable inside UPDATE ... SET."""
+    template = '%(function)s(DISTINCT %(expressions)s)' if distinct else '%(function)s(%(expressions)s)'
+    counted = queryset.order_by().annotate(
+        n=Func(F(field), function='COUNT', template=template)
+    ).values('n')
+    return Coalesce(Subquery(counted), 0)
+
+
+class EnrollmentQuerySet(models.QuerySet):
+    def apply_progress_delta(self, completed=0, total=0):
+        """
+        Shifts the completed/total counters of every matched enrollment by the given
+        deltas and refreshes ``progress`` in the same single UPDATE statement.
+        """
+        if not completed and not total:
+            return 0
+        changes = {}
+        if completed:
+            changes['completed_items'] = Greatest(F('completed_items') + completed, 0)
+        if total:
+            changes['total_items'] = Greatest(F('total_items') + total, 0)
+        changes['progress'] = progress_expression(
+            changes.get('completed_items', F('completed_items')),
+            changes.get('total_items', F('total_items')),
+        )
+        return self.update(**changes)
+
+    def recompute_progress(self):
+        """
+        Set-based full recount for every matched enrollment: the counters are
+        rewritten from correlated COUNT subqueries in one UPDATE, then progress
+        is derived from them in a second one, regardless of how many rows match.
+        """
+        total = _count(Lesson.objects.filter(course=OuterRef('course_id'))) + \
+            _count(Quiz.objects.filter(course=OuterRef('course_id')))
+        completed = _count(LessonProgress.objects.filter(
+            student=OuterRef('student_id'),
+            lesson__course=OuterRef('course_id'),
+            is_completed=True
+        )) + _count(Submission.objects.filter(
+            student=OuterRef('student_id'),
+            quiz__course=OuterRef('course_id')
+        ), 'quiz', distinct=True)
+
+        updated = self.update(completed_items=completed, total_items=total)
+        self.update(progress=progress_expression(F('completed_items'), F('total_items')))
+        return updated
+
+
+class Enrollment(DirtyFieldsMixin, models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name="enrollments")
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="enrollments")
     enrolled_at = models.DateTimeField(auto_now_add=True)
@@ -14,19 +81,41 @@ class Enrollment(models.Model):
     default=0.00,
     validators=[MinValueValidator(0.00), MaxValueValidator(100.00)]
 )
+    # Denormalized counters behind `progress`, kept in sync by courses/signals.py
+    completed_items = models.PositiveIntegerField(default=0)
+    total_items = models.PositiveIntegerField(default=0)
     completed = models.BooleanField(default=False)
     completed_at = models.DateTimeField(null=True, blank=True)
+
+    objects = EnrollmentQuerySet.as_manager()
+
     class Meta:
         constraints = [
         models.UniqueConstraint(fields=['student', 'course'], name='unique_enrollment')
     ]
         unique_together = ('student', 'course')
+        indexes = [
+            # Keyset pagination key (see core.pagination.KeysetPagination)
+            models.Index(fields=['enrolled_at', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.student.username} in {self.course.title}"
-    def recalculate_progress(self):
+
+    def save(self, *args, **kwargs):
+        # Seed the counters on creation (or when the enrollment is moved to
+        # another student/course); later changes arrive as deltas
+        if self.has_changed('student', 'course'):
+            self._set_counters(*self.count_items())
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'completed_items', 'total_items', 'progress'}
+        super().save(*args, **kwargs)
+
+    def count_items(self):
         """
-        Calculates progress based on Lessons Completed + Quizzes Submitted
+        Counts (completed, total) items for this enrollment from scratch:
+        Lessons Completed + Quizzes Submitted out of all Lessons + Quizzes.
         """
         # 1. Count Total Items (Lessons + Quizzes)
         total_lessons = self.course.lessons.count()
@@ -34,31 +123,41 @@ class Enrollment(models.Model):
         total_items = total_lessons + total_quizzes
 
         if total_items == 0:
-            self.progress = 0.00
-            self.save()
-            return
+            return 0, 0
 
         # 2. Count Completed Items
         # Count marked completed lessons
         completed_lessons = LessonProgress.objects.filter(
-            student=self.student, 
-            lesson__course=self.course, 
+            student=self.student_id, 
+            lesson__course=self.course_id, 
             is_completed=True
         ).count()
 
         # Count quizzes with at least one submission
         # (You might want to add logic here to check for a 'passing score')
         completed_quizzes = Submission.objects.filter(
-            student=self.student, 
-            quiz__course=self.course
+            student=self.student_id, 
+            quiz__course=self.course_id
         ).values('quiz').distinct().count()
 
-        total_completed = completed_lessons + completed_quizzes
+        return completed_lessons + completed_quizzes, total_items
 
-        # 3. Calculate Percentage
-        new_progress = (total_completed / total_items) * 100
-        self.progress = round(new_progress, 2)
-        self.save()
+    def recalculate_progress(self):
+        """
+        Full recount of the progress counters. Day-to-day updates go through
+        ``Enrollment.objects.apply_progress_delta``; this is the slow, exact path.
+        """
+        self._set_counters(*self.count_items())
+        self.save(update_fields=['completed_items', 'total_items', 'progress'])
+
+    def _set_counters(self, completed_items, total_items):
+        self.completed_items = completed_items
+        self.total_items = total_items
+        if total_items == 0:
+            self.progress = 0.00
+        else:
+            # 3. Calculate Percentage
+            self.progress = round((completed_items / total_items) * 100, 2)
 
 class GroupEnrollment(models.Model):
     group = models.ForeignKey(StudentGroup, on_delete=models.CASCADE, related_name="course_enrollments")
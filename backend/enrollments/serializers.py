@@ -1,12 +1,13 @@
 from rest_framework import serializers
 from .models import Enrollment, GroupEnrollment
 from accounts.models import User, StudentGroup
+from accounts.mixins import SparseFieldsMixin
 from courses.models import Course
 from accounts.serializers import UserSerializer, StudentGroupSerializer
 from courses.serializers import CourseSerializer
 
 
-class EnrollmentSerializer(serializers.ModelSerializer):
+class EnrollmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student = UserSerializer(read_only=True)
     course = CourseSerializer(read_only=True)
     
@@ -49,11 +50,11 @@ class EnrollmentSerializer(serializers.ModelSerializer):
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
             
-        instance.save()
+        instance.save_dirty()
         return instance
 
 
-class GroupEnrollmentSerializer(serializers.ModelSerializer):
+class GroupEnrollmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     group = StudentGroupSerializer(read_only=True)
     group_id = serializers.PrimaryKeyRelatedField(queryset=StudentGroup.objects.all(), write_only=True)
     course = CourseSerializer(read_only=True)
@@ -0,0 +1,50 @@
+# enrollments/tasks.py
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _recompute_key(course_id):
+    return f"enrollments:recompute-progress:{course_id}"
+
+
+def schedule_course_progress_recompute(course_id):
+    """
+    Debounced trigger for recompute_course_progress. The first content change
+    for a course schedules a run PROGRESS_RECOMPUTE_DEBOUNCE seconds out; any
+    further changes before that run starts collapse into it. Nothing is
+    claimed until the change commits, so a rolled-back edit cannot swallow
+    the recomputes of later ones.
+    """
+    transaction.on_commit(lambda: _enqueue_course_progress_recompute(course_id))
+
+
+def _enqueue_course_progress_recompute(course_id):
+    delay = settings.PROGRESS_RECOMPUTE_DEBOUNCE
+    key = _recompute_key(course_id)
+    if not cache.add(key, True, timeout=delay * 2 + 60):
+        return
+    try:
+        recompute_course_progress.apply_async((course_id,), countdown=delay)
+    except Exception:
+        # No run is coming to clear the marker; let the next change retry
+        cache.delete(key)
+        raise
+
+
+@shared_task
+def recompute_course_progress(course_id):
+    """
+    Rewrites the progress counters of every enrollment of a course after its
+    lessons or quizzes changed.
+    """
+    from courses.cache import bump_course_versions
+    from .models import Enrollment
+
+    # Clear the marker first so edits made while we run schedule a fresh pass
+    cache.delete(_recompute_key(course_id))
+    updated = Enrollment.objects.filter(course_id=course_id).recompute_progress()
+    # Bulk UPDATEs skip signals, so drop every user's cached progress for the course
+    bump_course_versions([course_id])
+    return f"Recomputed progress for {updated} enrollments of course {course_id}"
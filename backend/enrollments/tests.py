@@ -1,3 +1,123 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from accounts.models import User
+from courses.models import Course, Lesson, LessonProgress
+from courses.signals import update_progress_on_quiz_submission
+from quizzes.models import Quiz, Submission
+from .models import Enrollment
+from .tasks import _recompute_key, schedule_course_progress_recompute
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'enrollments'}},
+    PROGRESS_RECOMPUTE_DEBOUNCE=30,
+)
+class ProgressRecomputeScheduleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('enrollments.tasks.recompute_course_progress.apply_async')
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_changes_in_one_commit_collapse_into_one_run(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_course_progress_recompute(7)
+            schedule_course_progress_recompute(7)
+        self.apply_async.assert_called_once_with((7,), countdown=30)
+
+    def test_rolled_back_change_claims_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                schedule_course_progress_recompute(7)
+                transaction.set_rollback(True)
+        self.assertIsNone(cache.get(_recompute_key(7)))
+        self.apply_async.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_course_progress_recompute(7)
+        self.apply_async.assert_called_once()
+
+    def test_failed_enqueue_releases_the_marker(self):
+        self.apply_async.side_effect = ConnectionError('broker down')
+        with self.assertRaises(ConnectionError):
+            with self.captureOnCommitCallbacks(execute=True):
+                schedule_course_progress_recompute(7)
+        self.assertIsNone(cache.get(_recompute_key(7)))
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'progress'}},
+)
+class ProgressCounterTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create(username='student', email='student@example.com', phone='1')
+        self.course = Course.objects.create(title='Course', description='d')
+        with mock.patch('enrollments.tasks.recompute_course_progress.apply_async'):
+            self.lessons = [Lesson.objects.create(course=self.course, title=f'Lesson {i}', order=i) for i in range(3)]
+            self.quiz = Quiz.objects.create(course=self.course, title='Quiz')
+        self.enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+
+    def assert_counters(self, completed, total=4):
+        self.enrollment.refresh_from_db()
+        self.assertEqual((self.enrollment.completed_items, self.enrollment.total_items), (completed, total))
+        self.assertEqual(float(self.enrollment.progress), round(completed * 100 / total, 2))
+
+    def submit(self):
+        return Submission.objects.create(quiz=self.quiz, student=self.student)
+
+    def test_lesson_completion_shifts_counters(self):
+        progress = LessonProgress.objects.create(student=self.student, lesson=self.lessons[0], is_completed=True)
+        self.assert_counters(1)
+        progress.save()  # unchanged is_completed
+        self.assert_counters(1)
+        progress.delete()
+        self.assert_counters(0)
+
+    def test_first_submission_counts_once(self):
+        first = self.submit()
+        self.assert_counters(1)
+        repeat = self.submit()
+        self.assert_counters(1)
+
+        first.delete()
+        self.assert_counters(1)
+        repeat.delete()
+        self.assert_counters(0)
+
+    def test_concurrent_first_submissions_count_once(self):
+        # Both rows are committed before either post_save handler runs, so each
+        # handler sees the other submission
+        submissions = Submission.objects.bulk_create([
+            Submission(quiz=self.quiz, student=self.student),
+            Submission(quiz=self.quiz, student=self.student),
+        ])
+        for submission in Submission.objects.filter(pk__in=[s.pk for s in submissions]):
+            update_progress_on_quiz_submission(Submission, submission, created=True)
+        self.assert_counters(1)
+
+    def test_recompute_progress_rewrites_counters(self):
+        LessonProgress.objects.create(student=self.student, lesson=self.lessons[0], is_completed=True)
+        self.submit()
+        Enrollment.objects.filter(pk=self.enrollment.pk).update(completed_items=9, total_items=1, progress=0)
+
+        self.assertEqual(Enrollment.objects.filter(course=self.course).recompute_progress(), 1)
+        self.assert_counters(2)
+
+    def test_reconcile_repairs_drift(self):
+        self.submit()
+        Enrollment.objects.filter(pk=self.enrollment.pk).update(completed_items=3, total_items=7)
+
+        out = StringIO()
+        call_command('reconcile_progress', '--dry-run', stdout=out)
+        self.assertIn('Found 1', out.getvalue())
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.completed_items, 3)
+
+        call_command('reconcile_progress', stdout=StringIO())
+        self.assert_counters(1)
@@ -5,17 +5,28 @@ from rest_framework_tracking.mixins import LoggingMixin
 
 from .models import Enrollment, GroupEnrollment
 from .serializers import EnrollmentSerializer, GroupEnrollmentSerializer, GetUserEnrollmentSerializer
+from accounts.mixins import SparseFieldsViewMixin
 from accounts.permissions import IsAdminOrInstructor
+from courses.serializers import course_tree_prefetches
+from core.pagination import KeysetPagination
 
-class EnrollmentViewSet(LoggingMixin, viewsets.ModelViewSet):
-    # Optimization: Pre-load student and course data to prevent N+1 queries
-    queryset = Enrollment.objects.select_related('student', 'course').all()
+class EnrollmentViewSet(SparseFieldsViewMixin, LoggingMixin, viewsets.ModelViewSet):
+    queryset = Enrollment.objects.all()
     serializer_class = EnrollmentSerializer
     permission_classes = [IsAdminOrInstructor]  # Admin/Instructor only
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-enrolled_at', '-id')
 
     def get_queryset(self):
-        # We use self.queryset (which has select_related) as the base
+        # Optimization: Pre-load student and course data (incl. the nested course tree)
+        # to prevent N+1 queries, skipping whatever ?fields= / ?expand= leave out
         queryset = super().get_queryset()
+        if self.field_expanded('student'):
+            queryset = queryset.select_related('student')
+        if self.field_expanded('course'):
+            queryset = queryset.select_related('course').prefetch_related(*course_tree_prefetches(
+                'course__', requested=lambda name: self.field_requested(f'course.{name}')
+            ))
         
         user = self.request.user
         if getattr(user, 'role', None) == 'student':
@@ -33,7 +44,7 @@ class EnrollmentViewSet(LoggingMixin, viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         user_id = serializer.validated_data['user_id']
 
-        # Use get_queryset() to ensure we get the select_related optimization
+        # Use get_queryset() to ensure we get the select_related/prefetch optimization
         enrollments = self.get_queryset().filter(student_id=user_id)
         
         # Serialization is now efficient (no extra DB hits for course/student details)
@@ -41,8 +52,20 @@ class EnrollmentViewSet(LoggingMixin, viewsets.ModelViewSet):
 
         return Response(data, status=status.HTTP_200_OK)
 
-class GroupEnrollmentViewSet(LoggingMixin, viewsets.ModelViewSet):
-    # Optimization: Pre-load group and course
-    queryset = GroupEnrollment.objects.select_related('group', 'course').all()
+class GroupEnrollmentViewSet(SparseFieldsViewMixin, LoggingMixin, viewsets.ModelViewSet):
+    queryset = GroupEnrollment.objects.all()
     serializer_class = GroupEnrollmentSerializer
-    permission_classes = [IsAdminOrInstructor]  # Admin/Instructor only
\ No newline at end of file
+    permission_classes = [IsAdminOrInstructor]  # Admin/Instructor only
+
+    def get_queryset(self):
+        # Optimization: Pre-load group and course, skipping what ?fields= / ?expand= leave out
+        queryset = super().get_queryset()
+        if self.field_expanded('group'):
+            queryset = queryset.select_related('group')
+            if self.field_requested('group.students_info'):
+                queryset = queryset.prefetch_related('group__students')
+        if self.field_expanded('course'):
+            queryset = queryset.select_related('course').prefetch_related(*course_tree_prefetches(
+                'course__', requested=lambda name: self.field_requested(f'course.{name}')
+            ))
+        return queryset
\ No newline at end of file
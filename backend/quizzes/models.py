@@ -60,6 +60,12 @@ class Submission(models.Model):
     score = models.FloatField(default=0)
     submitted_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination key (see core.pagination.KeysetPagination)
+            models.Index(fields=['submitted_at', 'id']),
+        ]
+
     def calculate_score(self):
         # Preserved your grading logic, just added select_related for speed
         total_score = 0
@@ -6,6 +6,7 @@ from django.db.models import Exists, OuterRef
 from .models import Quiz, Question, Option, Submission
 from .serializers import QuizSerializer, QuestionSerializer, OptionSerializer, SubmissionSerializer
 from courses.models import LessonProgress
+from core.pagination import KeysetPagination
 
 class QuizViewSet(LoggingMixin, viewsets.ModelViewSet):
     # Base queryset is required for the router to understand the basename
@@ -73,4 +74,6 @@ class OptionViewSet(LoggingMixin, viewsets.ModelViewSet):
 class SubmissionViewSet(LoggingMixin, viewsets.ModelViewSet):
     queryset = Submission.objects.all()
     serializer_class = SubmissionSerializer
-    permission_classes = [permissions.IsAuthenticated]
\ No newline at end of file
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-submitted_at', '-id')
\ No newline at end of file
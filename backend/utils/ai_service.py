@@ -1,66 +1,177 @@
+import asyncio
 import os
 import uuid
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from google import genai
 from dotenv import load_dotenv
 import httpx
-import json
 
 load_dotenv()
 
-app = FastAPI()
 
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled client for every call to DRF: connections (and TLS sessions)
+    # are reused across sessions instead of set up per request
+    app.state.drf_client = httpx.AsyncClient(
+        timeout=5.0,
+        limits=httpx.Limits(
+            max_connections=int(os.getenv("DRF_HTTP_POOL_SIZE", "100")),
+            max_keepalive_connections=int(os.getenv("DRF_HTTP_POOL_SIZE", "100")),
+        ),
+    )
+    yield
+    await app.state.drf_client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def drf_client() -> httpx.AsyncClient:
+    return app.state.drf_client
+
 MODEL_NAME = "gemini-flash-latest"
+# "fake" replaces Gemini with FakeChat (no network, no API key) for load tests
+MODEL_BACKEND = os.getenv("AI_TUTOR_MODEL_BACKEND", "gemini")
 
-async def get_course_data(course_id: str, token: str):
-    headers = {"Authorization": f"Bearer {token}"}
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"{os.getenv('DRF_BACKEND_URL')}/courses/{course_id}/", 
-                headers=headers,
-                timeout=5.0
-            )
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise HTTPException(status_code=response.status_code, detail="Could not fetch lesson from DRF")
-        except httpx.RequestError as exc:
-            raise HTTPException(status_code=500, detail=f"Error contacting DRF: {exc}")
-        
-async def get_lesson_data(lesson_id: str, token: str):
+client = genai.Client(api_key=os.getenv("GEMINI_API_KEY")) if MODEL_BACKEND != "fake" else None
+
+
+class FakeChat:
+    """
+    Local stand-in for an async Gemini chat. Streams a canned reply of
+    FAKE_MODEL_REPLY_WORDS chunks, FAKE_MODEL_TOKEN_DELAY seconds apart, so
+    hundreds of concurrent sessions can be load-tested in one process
+    (see bench_ai_tutor.py).
+    """
+
+    def __init__(self, system_instruction):
+        self.system_instruction = system_instruction
+        self.reply_words = int(os.getenv("FAKE_MODEL_REPLY_WORDS", "40"))
+        self.token_delay = float(os.getenv("FAKE_MODEL_TOKEN_DELAY", "0.02"))
+
+    async def send_message_stream(self, message):
+        return self._stream(message)
+
+    async def _stream(self, message):
+        for i in range(self.reply_words):
+            await asyncio.sleep(self.token_delay)
+            yield SimpleNamespace(text=f"token{i} ")
+
+
+def create_chat(system_instruction):
+    """Opens an async chat session on the configured model backend."""
+    if MODEL_BACKEND == "fake":
+        return FakeChat(system_instruction)
+    return client.aio.chats.create(
+        model=MODEL_NAME,
+        config={"system_instruction": system_instruction, "temperature": 0.3}
+    )
+
+DEFAULT_PERSONA = "You are a helpful academic tutor."
+
+async def get_tutor_context(lesson_id: str, token: str):
+    """Lesson, course and tenant persona for a session, in one cached DRF call"""
     headers = {"Authorization": f"Bearer {token}"}
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"{os.getenv('DRF_BACKEND_URL')}/lessons/{lesson_id}/", 
-                headers=headers,
-                timeout=5.0
-            )
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise HTTPException(status_code=response.status_code, detail="Could not fetch lesson from DRF")
-        except httpx.RequestError as exc:
-            raise HTTPException(status_code=500, detail=f"Error contacting DRF: {exc}")
-        
-async def get_tenant_persona(token: str):
-    """Fetches the specific AI persona from the DRF backend"""
-    headers = {"Authorization": f"Bearer {token}" if not token.startswith("Bearer ") else token}
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"{os.getenv('DRF_BACKEND_URL')}/accounts/me/", 
-                headers=headers,
-                timeout=5.0
-            )
-            if response.status_code == 200:
-                data = response.json()
-                return data.get("tenant_details", {}).get("ai_persona_prompt", "You are a helpful assistant.")
-            return "You are a helpful academic tutor."
-        except Exception:
-            return "You are a helpful academic tutor."
+    try:
+        response = await drf_client().get(
+            f"{os.getenv('DRF_BACKEND_URL')}/lessons/{lesson_id}/tutor_context/", 
+            headers=headers
+        )
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise HTTPException(status_code=response.status_code, detail="Could not fetch lesson from DRF")
+    except httpx.RequestError as exc:
+        raise HTTPException(status_code=500, detail=f"Error contacting DRF: {exc}")
+
+TRANSCRIPT_FLUSH_DELAY = float(os.getenv("TRANSCRIPT_FLUSH_DELAY", "2.0"))
+TRANSCRIPT_FLUSH_BATCH = int(os.getenv("TRANSCRIPT_FLUSH_BATCH", "10"))
+TRANSCRIPT_FINAL_FLUSH_ATTEMPTS = 3
+
+
+class TranscriptSync:
+    """
+    Mirrors a session's transcript into Django through the append endpoint
+    (/ai-conversations/append/), sending only messages DRF has not stored.
+    Writes are debounced: a flush runs TRANSCRIPT_FLUSH_DELAY seconds after
+    the first unsynced message, or as soon as TRANSCRIPT_FLUSH_BATCH are
+    waiting, so a turn (question + reply) usually costs one request.
+    close() flushes whatever is left.
+    """
+
+    def __init__(self, session_id, lesson_id, auth_token):
+        self.session_id = session_id
+        self.lesson_id = lesson_id
+        self.auth_token = auth_token
+        self.summary = None
+        self.messages = []
+        self.synced = 0  # messages DRF has acknowledged
+        self._lock = asyncio.Lock()
+        self._timer = None
+        self._flushes = set()
+
+    def add(self, role, text):
+        self.messages.append({"role": role, "text": text})
+        if len(self.messages) - self.synced >= TRANSCRIPT_FLUSH_BATCH:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(TRANSCRIPT_FLUSH_DELAY, self._flush_now)
+
+    def _flush_now(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        task = asyncio.create_task(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self):
+        """Sends the unsynced tail; returns True once everything is stored."""
+        async with self._lock:
+            offset = self.synced
+            batch = self.messages[offset:]
+            if not batch:
+                return True
+            payload = {
+                "session_id": self.session_id,
+                "lesson": self.lesson_id,
+                "offset": offset,
+                "messages": batch,
+            }
+            if offset == 0 and self.summary:
+                payload["summary"] = self.summary
+            try:
+                response = await drf_client().post(
+                    f"{os.getenv('DRF_BACKEND_URL')}/ai-conversations/append/",
+                    headers={"Authorization": self.auth_token},
+                    json=payload,
+                )
+                if response.status_code in [200, 201]:
+                    self.synced = offset + len(batch)
+                    print(f"💾 Synced {len(batch)} new messages to Django (Size: {self.synced})")
+                elif response.status_code == 409:
+                    # DRF has fewer messages than we thought (a batch was lost): resend from there
+                    self.synced = min(response.json().get("length", 0), offset)
+                    print(f"↩️ Transcript sync gap, resending from message {self.synced}")
+                else:
+                    print(f"❌ Real-time Sync Failed ({response.status_code}): {response.text}")
+            except Exception as e:
+                print(f"⚠️ Non-blocking Background Sync Error: {e}")
+            return self.synced == len(self.messages)
+
+    async def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        for _ in range(TRANSCRIPT_FINAL_FLUSH_ATTEMPTS):
+            if await self.flush():
+                return
+
 
 @app.get("/")
 def read_root():
@@ -70,85 +181,58 @@ def read_root():
 async def tutor_websocket(websocket: WebSocket, lesson_id: str):
     await websocket.accept()
     
-    transcript_history = []
     token = websocket.query_params.get("token")
     auth_token = token if token.startswith("Bearer ") else f"Bearer {token}"
     
     session_id = str(uuid.uuid4())
-    lesson_title = "Lesson" 
 
-    async def save_to_django():
-        """Helper utility to sync transcripts instantly to Django DB"""
-        if not transcript_history:
-            return
-        try:
-            async with httpx.AsyncClient() as http_client:
-                # FIX 1: Use json.dumps to get a clean serialized string wrapper output
-                stringified_transcript = json.dumps(transcript_history)
-                
-                response = await http_client.post(
-                    f"{os.getenv('DRF_BACKEND_URL')}/ai-conversations/", 
-                    headers={"Authorization": auth_token},
-                    json={
-                        "session_id": session_id,
-                        "lesson": lesson_id,
-                        "transcript": stringified_transcript,
-                        "summary": f"Discussion about {lesson_title}"
-                    },
-                    timeout=5.0 
-                )
-                
-                # FIX 2: Explicitly completed the conditional check statement parameters
-                if response.status_code in [200,201]:
-                    print(f"💾 Live-synced conversation stack state to Django (Size: {len(transcript_history)})")
-                else:
-                    print(f"❌ Real-time Sync Failed ({response.status_code}): {response.text}")
-        except Exception as e:
-            print(f"⚠️ Non-blocking Background Sync Error: {e}")
+    sync = TranscriptSync(session_id, lesson_id, auth_token)
 
     try:
-        lesson_data = await get_lesson_data(lesson_id, token)
-        lesson_title = lesson_data.get("title", "Current Lesson")
-        course_id = lesson_data.get('course')
-        course_data = await get_course_data(course_id, token)
-        course_title = course_data.get('title', "Current Course")
-        system_instruction_base = await get_tenant_persona(token)
+        context = await get_tutor_context(lesson_id, token)
+        lesson_title = context.get("lesson_title") or "Current Lesson"
+        sync.summary = f"Discussion about {lesson_title}"
+        course_title = context.get("course_title") or "Current Course"
+        lesson_summary = context.get("lesson_summary") or "Not available."
+        system_instruction_base = context.get("persona") or DEFAULT_PERSONA
         
         system_instruction = f"""
         {system_instruction_base}
         Context:
         - Course: {course_title}
         - Current Lesson: {lesson_title}
+        - Lesson Summary: {lesson_summary}
         Guidelines:
         - Ground your answers in the lesson context.
         - If the user asks something outside the scope, gently bring them back to the lesson.
         """
         
-        chat = client.chats.create(
-            model=MODEL_NAME, 
-            config={"system_instruction": system_instruction, "temperature": 0.3}
-        )
+        chat = create_chat(system_instruction)
 
         while True:
             data = await websocket.receive_json()
             user_text = data.get("content")
             if not user_text: continue
 
-            transcript_history.append({"role": "user", "text": user_text})
-            await save_to_django()
+            sync.add("user", user_text)
 
-            response = chat.send_message(user_text)
-            transcript_history.append({"role": "ai", "text": response.text})
-            await save_to_django()
-            
-            await websocket.send_json({
-                "role": "ai",
-                "text": response.text
-            })
+            # Await the model without blocking the event loop, relaying each
+            # chunk as it arrives (the client appends is_stream chunks)
+            reply = []
+            async for chunk in await chat.send_message_stream(user_text):
+                if not chunk.text:
+                    continue
+                reply.append(chunk.text)
+                await websocket.send_json({
+                    "role": "ai",
+                    "text": chunk.text,
+                    "is_stream": True
+                })
+
+            sync.add("ai", "".join(reply))
 
     except WebSocketDisconnect:
         print(f"Client disconnected cleanly from lesson {lesson_id}. Final database sync executing...")
-        await save_to_django()
 
     except Exception as e:
         print(f"General Error inside WebSocket runtime thread: {e}")
@@ -156,4 +240,8 @@ async def tutor_websocket(websocket: WebSocket, lesson_id: str):
             await websocket.send_json({"role": "ai", "text": "I encountered an error. Please try refreshing."})
         except:
             pass
-        await save_to_django()
\ No newline at end of file
+
+    finally:
+        # Every way out of the session (disconnect, error, cancellation) ends
+        # with whatever is still unsynced being written
+        await sync.close()
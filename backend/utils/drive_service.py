@@ -1,37 +1,177 @@
 # utils/drive_service.py
+import json
 import os
+import re
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request, AuthorizedSession
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.http import MediaIoBaseUpload, MediaFileUpload
+from requests.adapters import HTTPAdapter
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, the atomic replace still applies
+    fcntl = None
 
 # --- CONFIGURATION ---
 SCOPES = ['https://www.googleapis.com/auth/drive']
 DRIVE_FOLDER_ID = '1NGwd2qaKu0OLN1YfTz8FDkDYanEu9PHD' 
 TOKEN_FILE = 'token.json' 
+DRIVE_API_URL = os.getenv('DRIVE_API_URL', 'https://www.googleapis.com/drive/v3')
+# Resumable upload chunk size; each chunk is buffered in memory while it is sent
+# (googleapiclient defaults to 100 MiB). Must be a multiple of 256 KiB.
+UPLOAD_CHUNK_SIZE = int(os.getenv('DRIVE_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+# Refresh this long before the access token actually expires
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+# Keep-alive connections to googleapis.com per process
+HTTP_POOL_SIZE = int(os.getenv('DRIVE_HTTP_POOL_SIZE', 20))
 # ---------------------
 
+# Process-wide state, shared by every request thread / Celery worker thread
+_lock = threading.Lock()
+_credentials = None
+_session = None
+_discovery_document = None
+# googleapiclient services wrap a non-thread-safe httplib2.Http: one per thread
+_thread_local = threading.local()
+
+
+def _is_fresh(creds):
+    if not creds or not creds.token:
+        return False
+    if creds.expiry is None:
+        return True
+    # google-auth keeps expiry as a naive UTC datetime
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return creds.expiry - TOKEN_REFRESH_MARGIN > now
+
+
+class _TokenFileLock:
+    """Serializes token.json refreshes across processes (gunicorn/Celery workers)."""
+
+    def __enter__(self):
+        self._file = open(f"{TOKEN_FILE}.lock", 'a')
+        if fcntl:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+def _write_token_file(creds):
+    # Write to a temp file and swap it in, so readers never see a partial token
+    directory = os.path.dirname(os.path.abspath(TOKEN_FILE))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.token-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w') as tmp:
+            tmp.write(creds.to_json())
+        os.replace(tmp_path, TOKEN_FILE)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _load_credentials():
+    if not os.path.exists(TOKEN_FILE):
+        raise Exception("token.json is missing or invalid. Run generate_token.py first.")
+    return Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
+
+
+def _refresh_credentials():
+    with _TokenFileLock():
+        # Another worker may have refreshed while we waited for the lock
+        on_disk = _load_credentials()
+        if _is_fresh(on_disk):
+            return on_disk
+        if not on_disk.refresh_token:
+            raise Exception("token.json is missing or invalid. Run generate_token.py first.")
+        try:
+            on_disk.refresh(Request())
+        except Exception as e:
+            raise Exception(f"Error refreshing token: {e}")
+        _write_token_file(on_disk)
+        return on_disk
+
+
 def get_credentials():
     """
-    Loads user credentials from token.json. 
-    Refreshes the token automatically if it's expired.
+    Returns the process-wide Drive credentials, loading token.json once and
+    refreshing the access token shortly before it expires.
     """
-    creds = None
-    if os.path.exists(TOKEN_FILE):
-        creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
-    
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            try:
-                creds.refresh(Request())
-                with open(TOKEN_FILE, 'w') as token:
-                    token.write(creds.to_json())
-            except Exception as e:
-                raise Exception(f"Error refreshing token: {e}")
-        else:
-            raise Exception("token.json is missing or invalid. Run generate_token.py first.")
-            
-    return creds
+    global _credentials
+    creds = _credentials
+    if _is_fresh(creds):
+        return creds
+
+    with _lock:
+        if not _is_fresh(_credentials):
+            creds = _credentials or _load_credentials()
+            if not _is_fresh(creds):
+                creds = _refresh_credentials()
+            _credentials = creds
+            if _session is not None:
+                _session.credentials = creds
+        return _credentials
+
+
+def get_session():
+    """
+    Returns the shared AuthorizedSession. Its connection pool keeps TLS
+    connections to Google alive between requests.
+    """
+    global _session
+    creds = get_credentials()
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = AuthorizedSession(creds)
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+def _drive_discovery_document():
+    # Parsed once per process from the copy bundled with googleapiclient (no
+    # discovery HTTP call); racing threads at most parse it twice
+    global _discovery_document
+    if _discovery_document is None:
+        _discovery_document = json.loads(get_static_doc('drive', 'v3'))
+    return _discovery_document
+
+
+def get_drive_service():
+    """
+    Returns this thread's Drive v3 service, built once from the static
+    discovery document and rebuilt only when the credentials are replaced.
+    """
+    creds = get_credentials()
+    cached = getattr(_thread_local, 'drive_service', None)
+    if cached is None or cached[0] is not creds:
+        service = build_from_document(_drive_discovery_document(), credentials=creds)
+        _thread_local.drive_service = cached = (creds, service)
+    return cached[1]
+
+def drive_file_id_from_url(video_url):
+    """
+    Extracts the Drive file id from a stored lesson video URL
+    (e.g. https://drive.google.com/file/d/123XYZ/preview). A bare id is
+    returned as is; None if the URL has no recognisable id.
+    """
+    match = re.search(r'/d/([a-zA-Z0-9_-]+)', video_url)
+    if match:
+        return match.group(1)
+    # Fallback: if you stored just the ID by mistake, use it directly
+    if 'http' not in video_url:
+        return video_url
+    return None
 
 def upload_video_private(file_obj_or_path):
     """
@@ -39,18 +179,17 @@ def upload_video_private(file_obj_or_path):
     Accepts either a Django file object OR a file path string.
     Returns the file_id (not a link).
     """
-    creds = get_credentials()
-    service = build('drive', 'v3', credentials=creds)
+    service = get_drive_service()
 
     # Handle input type (Django File Object vs Local Path String)
     if isinstance(file_obj_or_path, str):
         # It's a file path (from Celery)
         filename = os.path.basename(file_obj_or_path)
-        media = MediaFileUpload(file_obj_or_path, mimetype='video/mp4', resumable=True)
+        media = MediaFileUpload(file_obj_or_path, mimetype='video/mp4', chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
     else:
         # It's a Django file object (Direct Upload)
         filename = os.path.basename(file_obj_or_path.name)
-        media = MediaIoBaseUpload(file_obj_or_path.file, mimetype=file_obj_or_path.content_type, resumable=True)
+        media = MediaIoBaseUpload(file_obj_or_path.file, mimetype=file_obj_or_path.content_type, chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
 
     file_metadata = {
         'name': filename,
@@ -76,12 +215,11 @@ def stream_video_from_drive(file_id, range_header=None):
     Generates a response object to stream video bytes from Google Drive.
     Handles the 'Range' header to support video seeking.
     """
-    creds = get_credentials()
-    # Create an authorized session to make raw HTTP requests
-    authed_session = AuthorizedSession(creds)
+    # Shared authorized session: cached token, pooled keep-alive connections
+    authed_session = get_session()
     
     # We use the 'alt=media' parameter to get file content
-    drive_url = f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media"
+    drive_url = f"{DRIVE_API_URL}/files/{file_id}?alt=media"
     
     headers = {}
     if range_header:
@@ -97,30 +235,57 @@ def stream_video_from_drive(file_id, range_header=None):
 
     return response
 
+# Drive accepts at most 100 calls per batch request
+DRIVE_BATCH_LIMIT = 100
+
+def _video_processing_status(file):
+    metadata = file.get('videoMediaMetadata', {})
+
+    if not metadata:
+        return 'PROCESSING'
+
+    if 'width' in metadata and 'durationMillis' in metadata:
+        return 'READY'
+        
+    return 'PROCESSING'
+
 def check_video_processing_status(file_id):
     """
     Checks if a video on Google Drive has finished processing.
     Returns: 'PROCESSING', 'READY', or 'ERROR'
     """
-    creds = get_credentials()
-    service = build('drive', 'v3', credentials=creds)
+    service = get_drive_service()
 
     try:
         file = service.files().get(
             fileId=file_id, 
             fields='videoMediaMetadata'
         ).execute()
-        
-        metadata = file.get('videoMediaMetadata', {})
-
-        if not metadata:
-            return 'PROCESSING'
-
-        if 'width' in metadata and 'durationMillis' in metadata:
-            return 'READY'
-            
-        return 'PROCESSING'
+        return _video_processing_status(file)
 
     except Exception as e:
         print(f"Error checking status: {e}")
-        return 'ERROR'
\ No newline at end of file
+        return 'ERROR'
+
+def check_video_processing_statuses(file_ids):
+    """
+    Batched check_video_processing_status: one HTTP round trip per 100 files.
+    Returns {file_id: 'PROCESSING' | 'READY' | 'ERROR'}.
+    """
+    service = get_drive_service()
+    statuses = {}
+
+    def collect(request_id, response, exception):
+        if exception is not None:
+            print(f"Error checking status of {request_id}: {exception}")
+            statuses[request_id] = 'ERROR'
+        else:
+            statuses[request_id] = _video_processing_status(response)
+
+    file_ids = list(file_ids)
+    for start in range(0, len(file_ids), DRIVE_BATCH_LIMIT):
+        batch = service.new_batch_http_request(callback=collect)
+        for file_id in file_ids[start:start + DRIVE_BATCH_LIMIT]:
+            batch.add(service.files().get(fileId=file_id, fields='videoMediaMetadata'), request_id=file_id)
+        batch.execute()
+    return statuses
\ No newline at end of file
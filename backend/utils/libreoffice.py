@@ -0,0 +1,287 @@
+# utils/libreoffice.py
+"""
+Pool of warm, headless LibreOffice instances for document -> PDF conversion.
+
+Starting soffice costs seconds, and two soffice processes sharing the default
+user profile break each other. Each pool member therefore owns a private
+profile directory (-env:UserInstallation) and, when the ``uno`` Python bridge
+is importable, stays running between conversions: documents are converted
+over a UNO pipe connection at warm-start latency. Members are health-checked
+before use and recycled (restarted with a fresh profile) after
+LIBREOFFICE_MAX_CONVERSIONS conversions or any failure.
+
+Without ``uno`` each conversion falls back to a one-shot
+``soffice --convert-to pdf``, still with an isolated profile so conversions
+can run in parallel, but paying the full startup cost every time; workers log
+a warning at startup when that happens. ``uno`` ships with LibreOffice for
+the system Python (python3-uno), so run the worker on that interpreter or in
+a virtualenv created with --system-site-packages.
+
+The pool is per process: with Celery's prefork pool every worker child gets
+its own instance(s), so LIBREOFFICE_POOL_SIZE only needs to exceed 1 for
+threaded workers.
+"""
+import atexit
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+
+from celery.signals import worker_ready
+from django.conf import settings
+
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+except ImportError:
+    uno = None
+
+PDF_FILTERS = {
+    '.doc': 'writer_pdf_Export',
+    '.docx': 'writer_pdf_Export',
+    '.ppt': 'impress_pdf_Export',
+    '.pptx': 'impress_pdf_Export',
+    '.xls': 'calc_pdf_Export',
+    '.xlsx': 'calc_pdf_Export',
+}
+STARTUP_TIMEOUT = 30
+
+logger = logging.getLogger(__name__)
+
+
+class ConversionError(RuntimeError):
+    pass
+
+
+class PoolBusy(ConversionError):
+    """Every instance stayed busy for the whole wait; the document itself is fine."""
+
+
+def _warn_without_uno():
+    if uno is None:
+        logger.warning(
+            "The LibreOffice UNO bridge (python module 'uno') is not importable: "
+            "documents will be converted by starting soffice once per file, without "
+            "the warm instance pool. Install python3-uno for this interpreter."
+        )
+
+
+@worker_ready.connect
+def warn_on_worker_start(**kwargs):
+    _warn_without_uno()
+
+
+def _soffice_command(profile_dir, *args):
+    binary = settings.LIBREOFFICE_PATH
+    if not binary:
+        raise ConversionError("LibreOffice not found; set LIBREOFFICE_PATH.")
+    return [
+        binary,
+        f'-env:UserInstallation=file://{os.path.abspath(profile_dir)}',
+        '--headless', '--invisible', '--nologo', '--norestore', '--nodefault', '--nolockcheck',
+        *args,
+    ]
+
+
+class OfficeInstance:
+    """One soffice process (or, without uno, one profile for one-shot runs)."""
+
+    def __init__(self):
+        self.profile_dir = tempfile.mkdtemp(prefix='lo-profile-')
+        self.conversions = 0
+        self.process = None
+        self.desktop = None
+        if uno is not None:
+            self._start()
+
+    def _start(self):
+        pipe_name = f'lo-{uuid.uuid4().hex}'
+        self.process = subprocess.Popen(
+            _soffice_command(self.profile_dir, f'--accept=pipe,name={pipe_name};urp;StarOffice.ComponentContext'),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext('com.sun.star.bridge.UnoUrlResolver', local)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                context = resolver.resolve(f'uno:pipe,name={pipe_name};urp;StarOffice.ComponentContext')
+                break
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.close()
+                    raise ConversionError("LibreOffice did not start.")
+                time.sleep(0.25)
+        self.desktop = context.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', context)
+
+    def is_healthy(self):
+        if uno is None:
+            return True
+        if self.process is None or self.process.poll() is not None:
+            return False
+        try:
+            self.desktop.getFrames()
+            return True
+        except Exception:
+            return False
+
+    def convert(self, input_path, output_dir):
+        ext = os.path.splitext(input_path)[1].lower()
+        if ext not in PDF_FILTERS:
+            raise ConversionError(f"Unsupported file type: {ext}")
+        output_path = os.path.join(output_dir, f"{os.path.splitext(os.path.basename(input_path))[0]}.pdf")
+        if uno is not None:
+            self._convert_uno(input_path, output_path, PDF_FILTERS[ext])
+        else:
+            self._convert_subprocess(input_path, output_dir)
+        self.conversions += 1
+        if not os.path.exists(output_path):
+            raise ConversionError("PDF not generated by LibreOffice")
+        return output_path
+
+    def _convert_uno(self, input_path, output_path, pdf_filter):
+        # A document that hangs LibreOffice must not hang the worker: kill the
+        # instance, which makes the pending UNO call fail (and gets it recycled)
+        watchdog = threading.Timer(settings.LIBREOFFICE_CONVERT_TIMEOUT, self.process.kill)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            self._store_as_pdf(input_path, output_path, pdf_filter)
+        finally:
+            watchdog.cancel()
+
+    def _store_as_pdf(self, input_path, output_path, pdf_filter):
+        document = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(input_path)), '_blank', 0, (_prop('Hidden', True),)
+        )
+        if document is None:
+            raise ConversionError("LibreOffice could not open the document.")
+        try:
+            document.storeToURL(uno.systemPathToFileUrl(os.path.abspath(output_path)), (_prop('FilterName', pdf_filter),))
+        finally:
+            document.close(True)
+
+    def _convert_subprocess(self, input_path, output_dir):
+        try:
+            subprocess.run(
+                _soffice_command(self.profile_dir, '--convert-to', 'pdf', '--outdir', output_dir, input_path),
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=settings.LIBREOFFICE_CONVERT_TIMEOUT,
+            )
+        except subprocess.CalledProcessError as e:
+            raise ConversionError(e.stderr.decode(errors='ignore'))
+        except subprocess.TimeoutExpired:
+            raise ConversionError("LibreOffice timed out.")
+
+    def close(self):
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+            self.desktop = None
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+def _prop(name, value):
+    prop = PropertyValue()
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+
+class OfficePool:
+    def __init__(self, size, max_conversions):
+        self.size = size
+        self.max_conversions = max_conversions
+        self._idle = queue.LifoQueue()  # reuse the warmest instance first
+        self._started = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self, timeout):
+        with self._lock:
+            if self._idle.empty() and self._started < self.size:
+                self._started += 1
+                start_new = True
+            else:
+                start_new = False
+        if start_new:
+            return self._start_instance()
+        try:
+            instance = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise PoolBusy("No LibreOffice instance became free in time.")
+        if not instance.is_healthy():
+            instance.close()
+            return self._start_instance()
+        return instance
+
+    def _start_instance(self):
+        # The caller already holds a slot in _started; give it back on failure
+        try:
+            return OfficeInstance()
+        except Exception:
+            with self._lock:
+                self._started -= 1
+            raise
+
+    def _release(self, instance, failed):
+        if failed or instance.conversions >= self.max_conversions:
+            instance.close()
+            with self._lock:
+                self._started -= 1
+            return
+        self._idle.put(instance)
+
+    def convert(self, input_path, output_dir):
+        """Converts ``input_path`` to a PDF inside ``output_dir`` and returns its path."""
+        instance = self._acquire(timeout=settings.LIBREOFFICE_CONVERT_TIMEOUT)
+        failed = True
+        try:
+            path = instance.convert(input_path, output_dir)
+            failed = False
+            return path
+        except ConversionError:
+            raise
+        except Exception as e:
+            raise ConversionError(str(e))
+        finally:
+            self._release(instance, failed)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def convert_to_pdf(input_path, output_dir):
+    """Converts an Office document to PDF with the process-wide instance pool."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _warn_without_uno()
+                _pool = OfficePool(settings.LIBREOFFICE_POOL_SIZE, settings.LIBREOFFICE_MAX_CONVERSIONS)
+                atexit.register(_pool.close)
+    return _pool.convert(input_path, output_dir)
@@ -0,0 +1,76 @@
+# utils/tenant_limits.py
+"""
+Per-tenant concurrency caps for Celery tasks.
+
+Each tenant gets TENANT_TASK_CONCURRENCY[kind] slots per kind of work
+("media", "documents"). A slot is a cache key claimed with an atomic add, so
+the cap holds across every worker sharing the cache. Slots carry a lease
+(TENANT_SLOT_LEASE) so a worker that dies mid-task frees its slot eventually.
+
+A task that finds all of its tenant's slots taken is put back on its queue
+with a countdown instead of holding a worker while it waits, leaving the
+worker free for other tenants' work.
+"""
+import random
+import uuid
+from contextlib import contextmanager
+
+from celery.exceptions import Ignore
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _slot_key(kind, tenant_id, slot):
+    return f"tenant-slots:{kind}:{tenant_id or 'none'}:{slot}"
+
+
+def acquire_slot(kind, tenant_id):
+    """
+    Claims a free slot and returns its lease, ``None`` when ``kind`` is not
+    capped, or ``False`` when every slot of the tenant is taken.
+    """
+    limit = settings.TENANT_TASK_CONCURRENCY.get(kind)
+    if not limit:
+        return None
+    token = uuid.uuid4().hex
+    for slot in range(limit):
+        key = _slot_key(kind, tenant_id, slot)
+        if cache.add(key, token, timeout=settings.TENANT_SLOT_LEASE[kind]):
+            return key, token
+    return False
+
+
+def release_slot(lease):
+    if not lease:
+        return
+    key, token = lease
+    # Only free the slot if our lease has not expired and been claimed again
+    if cache.get(key) == token:
+        cache.delete(key)
+
+
+def requeue(task, countdown):
+    """
+    Puts the running bound ``task`` back on its queue (same priority, arguments
+    and chain) ``countdown`` seconds out, plus jitter, and ends this run with
+    Ignore. Unlike task.retry() it does not count against max_retries.
+    """
+    task.signature_from_request().apply_async(countdown=countdown + random.uniform(0, countdown / 2))
+    raise Ignore()
+
+
+@contextmanager
+def tenant_slot(task, kind, tenant_id):
+    """
+    Runs the body of the bound ``task`` in one of the tenant's ``kind`` slots.
+
+    When none is free the task is re-queued TENANT_BUSY_RETRY_COUNTDOWN
+    seconds out (see requeue).
+    """
+    lease = acquire_slot(kind, tenant_id)
+    if lease is False:
+        requeue(task, settings.TENANT_BUSY_RETRY_COUNTDOWN)
+    try:
+        yield
+    finally:
+        release_slot(lease)
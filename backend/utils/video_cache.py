@@ -0,0 +1,405 @@
+# utils/video_cache.py
+"""
+Disk-backed byte-range cache in front of the Drive video proxy.
+
+Videos are cached as fixed-size chunks (``<dir>/<file_id>/<index>.chunk``)
+next to a ``meta.json`` sidecar holding the total size and content type.
+A Range request is answered chunk by chunk: cached chunks are read from
+disk and each run of consecutive missing chunks is fetched upstream with a
+single Range request. Chunk files are touched on every read, and when the
+cache outgrows its byte budget the least recently used chunks are deleted.
+
+The cache is shared by all worker processes through the filesystem. Each
+process counts hits, misses and evictions in ``VideoChunkCache.stats`` and
+adds them to cluster-wide totals in the Django cache every
+VIDEO_CACHE_STATS_INTERVAL seconds and at exit (see shared_stats() and
+``manage.py video_cache_stats``); totals survive worker restarts.
+"""
+import atexit
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+META_FILE = 'meta.json'
+CHUNK_SUFFIX = '.chunk'
+# Upper bound on chunks fetched by one upstream request
+MAX_FETCH_CHUNKS = 8
+# Evict down to this fraction of the budget so we don't evict on every write
+EVICT_TO = 0.9
+
+STATS_FIELDS = ('hits', 'misses', 'hit_bytes', 'miss_bytes', 'upstream_requests', 'evicted_chunks')
+STATS_KEY_PREFIX = 'video-cache:stats:'
+
+_FILE_ID_RE = re.compile(r'^[A-Za-z0-9_-]+$')
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+_CONTENT_RANGE_RE = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+
+
+class UpstreamError(Exception):
+    def __init__(self, status):
+        super().__init__(f"Upstream returned {status}")
+        self.status = status
+
+
+class RangeNotSatisfiable(Exception):
+    def __init__(self, total):
+        super().__init__(f"Range not satisfiable (size {total})")
+        self.total = total
+
+
+class HttpRangeFetcher:
+    """
+    Fetches byte ranges of Drive files over HTTP. ``base_url`` defaults to the
+    Drive API (``utils.drive_service.DRIVE_API_URL``) and ``session`` to the
+    shared authorized session; tests point both at a local fake server.
+    """
+
+    def __init__(self, base_url=None, session=None):
+        self.base_url = base_url
+        self.session = session
+
+    def fetch(self, file_id, start, end):
+        """Returns (bytes, total size, content type) for bytes start..end inclusive."""
+        from utils import drive_service
+
+        session = self.session or drive_service.get_session()
+        base_url = self.base_url or drive_service.DRIVE_API_URL
+        response = session.get(
+            f"{base_url}/files/{file_id}?alt=media",
+            headers={'Range': f'bytes={start}-{end}'},
+        )
+        if response.status_code >= 400:
+            raise UpstreamError(response.status_code)
+        data = response.content
+        content_type = response.headers.get('Content-Type', 'video/mp4')
+        if response.status_code == 206:
+            match = _CONTENT_RANGE_RE.match(response.headers.get('Content-Range', ''))
+            if not match or match.group(3) == '*' or int(match.group(1)) != start:
+                raise UpstreamError(502)
+            return data, int(match.group(3)), content_type
+        # Upstream ignored the Range header and sent the whole file
+        return data[start:end + 1], len(data), content_type
+
+
+class CachedRange:
+    """One ranged response: headers plus a lazy iterator over its bytes."""
+
+    def __init__(self, cache, file_id, meta, start, end, partial, prefetched=None):
+        self.cache = cache
+        self.prefetched = prefetched or {}
+        self.file_id = file_id
+        self.total = meta['size']
+        self.content_type = meta['content_type']
+        self.start = start
+        self.end = end
+        self.status = 206 if partial else 200
+
+    @property
+    def headers(self):
+        headers = {
+            'Content-Length': str(self.end - self.start + 1),
+            'Accept-Ranges': 'bytes',
+        }
+        if self.status == 206:
+            headers['Content-Range'] = f'bytes {self.start}-{self.end}/{self.total}'
+        return headers
+
+    def __iter__(self):
+        size = self.cache.chunk_size
+        first, last = self.start // size, self.end // size
+        index = first
+        while index <= last:
+            if index in self.prefetched:
+                chunks = [self.prefetched.pop(index)]
+            else:
+                chunks = self.cache.get_chunks(self.file_id, index, last, self.total)
+            for offset, data in enumerate(chunks):
+                chunk_start = (index + offset) * size
+                lo = max(self.start - chunk_start, 0)
+                hi = min(self.end - chunk_start + 1, len(data))
+                yield data[lo:hi]
+            index += len(chunks)
+
+
+class VideoChunkCache:
+    def __init__(self, directory, max_bytes, chunk_size, fetcher=None, stats_interval=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.fetcher = fetcher or HttpRangeFetcher()
+        self._lock = threading.Lock()
+        self._size_estimate = None
+        # This process's counters; with ``stats_interval`` set they are also
+        # published to the shared totals that often (in seconds)
+        self.stats = dict.fromkeys(STATS_FIELDS, 0)
+        self.stats_interval = stats_interval
+        self._unpublished = dict.fromkeys(STATS_FIELDS, 0)
+        self._published_at = time.monotonic()
+
+    # --- public API ---
+
+    def open_range(self, file_id, range_header=None):
+        """
+        Resolves ``range_header`` against the file and returns a CachedRange.
+        Raises UpstreamError / RangeNotSatisfiable.
+        """
+        if not _FILE_ID_RE.match(file_id):
+            raise ValueError(f"Unsafe Drive file id: {file_id!r}")
+        requested = _parse_range(range_header)
+        meta = self._read_meta(file_id)
+        prefetched = {}
+        if meta is None:
+            # Learn the size from the chunk the client wants (or the first one)
+            start = requested[0] if requested and requested[0] is not None else 0
+            index = start // self.chunk_size
+            meta, data = self._learn_meta(file_id, index)
+            prefetched[index] = data
+
+        total = meta['size']
+        if requested is None:
+            return CachedRange(self, file_id, meta, 0, total - 1, partial=False, prefetched=prefetched)
+        start, end = requested
+        if start is None:  # suffix range: last N bytes
+            start, end = max(total - end, 0), total - 1
+        elif end is None or end >= total:
+            end = total - 1
+        if start >= total or start > end:
+            raise RangeNotSatisfiable(total)
+        return CachedRange(self, file_id, meta, start, end, partial=True, prefetched=prefetched)
+
+    def get_chunks(self, file_id, index, last, total):
+        """
+        Returns the chunk at ``index`` from disk, or fetches it together with
+        the missing chunks directly after it (up to ``last``) in one request.
+        """
+        data = self._read_chunk(file_id, index, total)
+        if data is not None:
+            self._count(True, len(data))
+            return [data]
+
+        run_end = index
+        while (run_end < last and run_end - index + 1 < MAX_FETCH_CHUNKS
+               and not self._has_chunk(file_id, run_end + 1, total)):
+            run_end += 1
+        return self._fetch_chunks(file_id, index, run_end, total)
+
+    # --- upstream ---
+
+    def _fetch_chunks(self, file_id, first, last, total):
+        start = first * self.chunk_size
+        end = min((last + 1) * self.chunk_size, total) - 1
+        data, _, _ = self._fetch(file_id, start, end)
+        if len(data) != end - start + 1:
+            raise UpstreamError(502)  # short read; never cache a truncated chunk
+        chunks = [data[i:i + self.chunk_size] for i in range(0, len(data), self.chunk_size)]
+        for offset, chunk in enumerate(chunks):
+            self._write_chunk(file_id, first + offset, chunk)
+        self._count(False, len(data))
+        return chunks
+
+    def _learn_meta(self, file_id, index):
+        start = index * self.chunk_size
+        data, total, content_type = self._fetch(file_id, start, start + self.chunk_size - 1)
+        meta = {'size': total, 'content_type': content_type}
+        self._write_file(os.path.join(self._file_dir(file_id), META_FILE), json.dumps(meta).encode())
+        if data:
+            self._write_chunk(file_id, index, data)
+            self._count(False, len(data))
+        return meta, data
+
+    def _fetch(self, file_id, start, end):
+        self._bump(upstream_requests=1)
+        return self.fetcher.fetch(file_id, start, end)
+
+    # --- disk ---
+
+    def _file_dir(self, file_id):
+        return os.path.join(self.directory, file_id)
+
+    def _chunk_path(self, file_id, index):
+        return os.path.join(self._file_dir(file_id), f'{index}{CHUNK_SUFFIX}')
+
+    def _expected_length(self, index, total):
+        return max(min(self.chunk_size, total - index * self.chunk_size), 0)
+
+    def _has_chunk(self, file_id, index, total):
+        try:
+            return os.path.getsize(self._chunk_path(file_id, index)) == self._expected_length(index, total)
+        except OSError:
+            return False
+
+    def _read_chunk(self, file_id, index, total):
+        path = self._chunk_path(file_id, index)
+        try:
+            with open(path, 'rb') as chunk:
+                data = chunk.read()
+            _touch(path)  # mark as recently used
+        except OSError:
+            return None
+        if len(data) != self._expected_length(index, total):
+            return None  # truncated, or the file changed size upstream
+        return data
+
+    def _read_meta(self, file_id):
+        try:
+            with open(os.path.join(self._file_dir(file_id), META_FILE)) as meta:
+                return json.load(meta)
+        except (OSError, ValueError):
+            return None
+
+    def _write_chunk(self, file_id, index, data):
+        self._write_file(self._chunk_path(file_id, index), data)
+        with self._lock:
+            if self._size_estimate is not None:
+                self._size_estimate += len(data)
+            over_budget = self._size_estimate is None or self._size_estimate > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    @staticmethod
+    def _write_file(path, data):
+        # Temp file + rename: concurrent readers never see a partial chunk
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        _touch(path)
+
+    def evict(self):
+        """Deletes least recently used chunks until the cache fits its budget."""
+        entries = []
+        for file_dir in _scandir(self.directory):
+            if not file_dir.is_dir():
+                continue
+            for entry in _scandir(file_dir.path):
+                if entry.name.endswith(CHUNK_SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        if total > self.max_bytes:
+            target = self.max_bytes * EVICT_TO
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                except OSError:
+                    continue
+                total -= size
+                evicted += 1
+        with self._lock:
+            self._size_estimate = total
+        self._bump(evicted_chunks=evicted)
+        if evicted:
+            logger.info("Video cache evicted %s chunks; %s bytes in use", evicted, total)
+
+    # --- stats ---
+
+    def _count(self, hit, nbytes):
+        if hit:
+            self._bump(hits=1, hit_bytes=nbytes)
+        else:
+            self._bump(misses=1, miss_bytes=nbytes)
+
+    def _bump(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self.stats[name] += delta
+                self._unpublished[name] += delta
+            due = (self.stats_interval is not None
+                   and time.monotonic() - self._published_at >= self.stats_interval)
+        if due:
+            self.publish_stats()
+
+    def publish_stats(self):
+        """Adds the counts gathered since the last call to the shared totals."""
+        with self._lock:
+            pending, self._unpublished = self._unpublished, dict.fromkeys(STATS_FIELDS, 0)
+            self._published_at = time.monotonic()
+        _add_to_shared_stats(pending)
+
+
+def _add_to_shared_stats(deltas):
+    from django.core.cache import cache
+
+    try:
+        for name, delta in deltas.items():
+            if delta:
+                key = STATS_KEY_PREFIX + name
+                cache.add(key, 0, timeout=None)
+                cache.incr(key, delta)
+    except Exception as e:
+        # Metrics must never break video serving
+        logger.warning("Could not publish video cache stats: %s", e)
+
+
+def shared_stats():
+    """Totals of every process's counters (as far as they have been published)."""
+    from django.core.cache import cache
+
+    values = cache.get_many([STATS_KEY_PREFIX + name for name in STATS_FIELDS])
+    return {name: values.get(STATS_KEY_PREFIX + name, 0) for name in STATS_FIELDS}
+
+
+def _touch(path):
+    # Explicit ns timestamps: the filesystem clock is too coarse to order reads
+    now = time.time_ns()
+    os.utime(path, ns=(now, now))
+
+
+def _scandir(path):
+    try:
+        return list(os.scandir(path))
+    except OSError:
+        return []
+
+
+def _parse_range(range_header):
+    """'bytes=a-b' -> (a, b); open ends are None. None when absent or unsupported."""
+    if not range_header:
+        return None
+    match = _RANGE_RE.match(range_header.strip())
+    if not match or match.groups() == ('', ''):
+        return None  # multi-range or malformed: serve the whole file
+    start, end = match.groups()
+    if not start:
+        return None, int(end)
+    return int(start), int(end) if end else None
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_video_cache():
+    """The process-wide cache configured by the VIDEO_CACHE_* settings."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = VideoChunkCache(
+                    directory=settings.VIDEO_CACHE_DIR,
+                    max_bytes=settings.VIDEO_CACHE_MAX_BYTES,
+                    chunk_size=settings.VIDEO_CACHE_CHUNK_SIZE,
+                    stats_interval=settings.VIDEO_CACHE_STATS_INTERVAL,
+                )
+                atexit.register(_cache.publish_stats)
+    return _cache
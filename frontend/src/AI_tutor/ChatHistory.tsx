@@ -13,7 +13,8 @@ interface TranscriptItem {
 interface Conversation {
     id: number;
     summary: string;
-    transcript: TranscriptItem[];
+    message_count: number;
+    last_message: TranscriptItem | null;
     created_at: string;
 }
 
@@ -25,6 +26,8 @@ interface ChatHistoryProps {
 const ChatHistory: React.FC<ChatHistoryProps> = ({ lessonId, authToken }) => {
     const [conversations, setConversations] = useState<Conversation[]>([]);
     const [selectedChat, setSelectedChat] = useState<Conversation | null>(null);
+    const [messages, setMessages] = useState<TranscriptItem[]>([]);
+    const [nextPage, setNextPage] = useState<string | null>(null);
     const [isLoading, setIsLoading] = useState<boolean>(true);
 
     useEffect(() => {
@@ -47,6 +50,24 @@ const ChatHistory: React.FC<ChatHistoryProps> = ({ lessonId, authToken }) => {
         fetchHistory();
     }, [lessonId, authToken]);
 
+    // Transcripts are paged by the API; fetch one page at a time
+    const loadMessages = async (url: string, reset: boolean) => {
+        try {
+            const response = await API.get(url);
+            setMessages((prev) => (reset ? response.data.results : [...prev, ...response.data.results]));
+            setNextPage(response.data.next);
+        } catch (err) {
+            console.error("Failed to load AI conversation transcript:", err);
+        }
+    };
+
+    const openChat = (chat: Conversation) => {
+        setSelectedChat(chat);
+        setMessages([]);
+        setNextPage(null);
+        loadMessages(`/ai-conversations/${chat.id}/messages/?cursor=`, true);
+    };
+
     // Format ISO string to local human-readable date
     const formatDate = (dateString: string) => {
         return new Date(dateString).toLocaleDateString(undefined, {
@@ -83,7 +104,7 @@ const ChatHistory: React.FC<ChatHistoryProps> = ({ lessonId, authToken }) => {
                 </div>
                 
                 <div className="flex-1 p-4 overflow-y-auto space-y-4 max-h-[430px]">
-                    {selectedChat.transcript.map((m, index) => (
+                    {messages.map((m, index) => (
                         <div key={index} className={`flex ${m.role === 'user' ? 'justify-end' : 'justify-start'}`}>
                             <div className={`max-w-[85%] p-3 rounded-2xl text-sm shadow-sm ${
                                 m.role === 'user'
@@ -96,6 +117,14 @@ const ChatHistory: React.FC<ChatHistoryProps> = ({ lessonId, authToken }) => {
                             </div>
                         </div>
                     ))}
+                    {nextPage && (
+                        <button
+                            onClick={() => loadMessages(nextPage, false)}
+                            className="w-full py-2 text-xs text-indigo-600 dark:text-indigo-400 hover:underline"
+                        >
+                            Load more messages
+                        </button>
+                    )}
                 </div>
             </div>
         );
@@ -113,7 +142,7 @@ const ChatHistory: React.FC<ChatHistoryProps> = ({ lessonId, authToken }) => {
                 conversations.map((chat) => (
                     <button
                         key={chat.id}
-                        onClick={() => setSelectedChat(chat)}
+                        onClick={() => openChat(chat)}
                         className="w-full text-left p-3 bg-white dark:bg-gray-800 border dark:border-gray-700 hover:border-indigo-500 dark:hover:border-indigo-500 rounded-xl shadow-sm transition-all flex items-center justify-between group active:scale-[0.99]"
                     >
                         <div className="space-y-1 max-w-[85%]">
@@ -124,8 +153,13 @@ const ChatHistory: React.FC<ChatHistoryProps> = ({ lessonId, authToken }) => {
                                 <Calendar size={12} />
                                 <span>{formatDate(chat.created_at)}</span>
                                 <span>•</span>
-                                <span>{chat.transcript?.length || 0} messages</span>
+                                <span>{chat.message_count || 0} messages</span>
                             </div>
+                            {chat.last_message && (
+                                <p className="text-[11px] text-gray-500 dark:text-gray-400 truncate">
+                                    {chat.last_message.text}
+                                </p>
+                            )}
                         </div>
                         <ChevronRight size={16} className="text-gray-400 group-hover:translate-x-0.5 transition-transform" />
                     </button>